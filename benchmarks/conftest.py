@@ -0,0 +1,61 @@
+import os
+import subprocess
+
+import pytest
+
+import headless
+
+# Where baselines are stored, unless --benchmark-storage says otherwise.
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def pytest_configure(config):
+    # The default storage is relative to the working directory; pin it down so
+    # baselines are found wherever pytest runs from.
+    if config.getoption("benchmark_storage", None) == "file://./.benchmarks":
+        config.option.benchmark_storage = "file://" + BASELINES
+
+    # Baselines must match a commit, so the code they measure can be told.
+    if config.getoption("benchmark_save", None) and has_changes():
+        raise pytest.UsageError(
+            "commit or stash your changes before recording baselines")
+
+
+def has_changes():
+    """Return `True` if tracked files other than the baselines have changed.
+
+    Outside a git checkout, nothing has.
+    """
+    try:
+        status = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no", "--",
+             ".", ":(exclude)benchmarks/baselines"],
+            cwd=os.path.dirname(os.path.dirname(BASELINES)),
+            stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return bool(status.strip())
+
+
+@pytest.fixture(scope="session")
+def surround():
+    """The plugin's surround module, imported headlessly.
+    """
+    return headless.load_plugin()
+
+
+@pytest.fixture
+def make_view(surround):
+    """Return a function creating views with the given text and caret points.
+
+    Settings are passed as keyword arguments.
+    """
+    def make_view(text, points, **settings):
+        view = headless.View(text)
+        view.sel().clear()
+        for pt in points:
+            view.sel().add(pt)
+        for name, value in settings.items():
+            view.settings().set(name, value)
+        return view
+    return make_view
@@ -0,0 +1,403 @@
+"""Pure-Python stand-ins for the parts of Sublime Text and Six Surround uses.
+
+They let us import the plugin and run its commands outside the editor, which is
+what the benchmarks do. They model behavior only as far as Surround needs it.
+
+Call `load_plugin()` to get the `surround` module.
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+# The plugin package; the directory containing this one.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The name the plugin package is imported as.
+PACKAGE = "surround_headless"
+
+
+class Region(object):
+    """Like `sublime.Region`.
+    """
+
+    __slots__ = ("a", "b")
+
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
+    def empty(self):
+        return self.a == self.b
+
+    def __eq__(self, other):
+        return (self.a, self.b) == (other.a, other.b)
+
+    def __repr__(self):
+        return "Region(%d, %d)" % (self.a, self.b)
+
+
+class Selection(object):
+    """Like `sublime.Selection`, without merging overlapping regions.
+    """
+
+    def __init__(self):
+        self._regions = [Region(0)]
+
+    def clear(self):
+        self._regions = []
+
+    def add(self, region):
+        if not isinstance(region, Region):
+            region = Region(region)
+        if self._regions and region.begin() < self._regions[-1].begin():
+            self._regions.append(region)
+            self._regions.sort(key=Region.begin)
+        else:
+            self._regions.append(region)
+
+    def add_all(self, regions):
+        for region in regions:
+            self.add(region)
+
+    def __getitem__(self, i):
+        return self._regions[i]
+
+    def __len__(self):
+        return len(self._regions)
+
+    def __iter__(self):
+        return iter(list(self._regions))
+
+    def _shift(self, edits):
+        # Move selections after edits replacing [a, b) with size characters.
+        # Edits are (a, b, size) tuples in ascending order and don't overlap.
+        points = sorted(set(pt for region in self._regions
+                            for pt in (region.a, region.b)))
+        moved = {}
+        i = delta = 0
+        for pt in points:
+            while i < len(edits) and edits[i][1] <= pt:
+                a, b, size = edits[i]
+                delta += size - (b - a)
+                i += 1
+            if i < len(edits) and edits[i][0] < pt:
+                # Inside an edited span.
+                a, b, size = edits[i]
+                moved[pt] = min(pt, a + size) + delta
+            else:
+                moved[pt] = pt + delta
+        for region in self._regions:
+            region.a = moved[region.a]
+            region.b = moved[region.b]
+
+
+class Settings(dict):
+    """Like `sublime.Settings`.
+    """
+
+    def get(self, name, default=None):
+        return dict.get(self, name, default)
+
+    def set(self, name, value):
+        self[name] = value
+
+    def erase(self, name):
+        self.pop(name, None)
+
+
+class View(object):
+    """Like `sublime.View`, holding its buffer in a string.
+
+    Every method call counts as a call through the API in `api_calls`, so
+    benchmarks can report how chatty the plugin is.
+
+    Commands edit from the end of the buffer backwards, so edits are queued
+    while they keep coming in that order and applied together on the next read.
+    Otherwise, copying the whole buffer after every edit would take longer than
+    the code being measured.
+    """
+
+    _next_id = 1
+
+    def __init__(self, text=""):
+        self._id = View._next_id
+        View._next_id += 1
+        self._text = text
+        # Queued edits, as (a, b, text) tuples in descending order.
+        self._pending = []
+        self._change_count = 0
+        self._sel = Selection()
+        self._settings = Settings()
+        self.api_calls = 0
+
+    def id(self):
+        self.api_calls += 1
+        return self._id
+
+    def buffer_id(self):
+        self.api_calls += 1
+        return self._id
+
+    def is_valid(self):
+        self.api_calls += 1
+        return True
+
+    def size(self):
+        self.api_calls += 1
+        return len(self._buffer())
+
+    def scope_name(self, pt):
+        self.api_calls += 1
+        return "text.plain "
+
+    def change_count(self):
+        self.api_calls += 1
+        return self._change_count
+
+    def settings(self):
+        self.api_calls += 1
+        return self._settings
+
+    def sel(self):
+        self.api_calls += 1
+        self._flush()
+        return self._sel
+
+    def substr(self, x):
+        self.api_calls += 1
+        text = self._buffer()
+        if isinstance(x, Region):
+            return text[x.begin():x.end()]
+        return text[x:x + 1] if 0 <= x < len(text) else "\x00"
+
+    def line(self, x):
+        self.api_calls += 1
+        if isinstance(x, Region):
+            begin, end = x.begin(), x.end()
+        else:
+            begin = end = x
+        text = self._buffer()
+        begin = text.rfind("\n", 0, begin) + 1
+        end = text.find("\n", end)
+        return Region(begin, len(text) if end < 0 else end)
+
+    def insert(self, edit, pt, text):
+        self._edit(pt, pt, text)
+        return len(text)
+
+    def replace(self, edit, region, text):
+        self._edit(region.begin(), region.end(), text)
+
+    def erase(self, edit, region):
+        self._edit(region.begin(), region.end(), "")
+
+    def _edit(self, a, b, text):
+        self.api_calls += 1
+        if self._pending and b > self._pending[-1][0]:
+            self._flush()
+        self._pending.append((a, b, text))
+        self._change_count += 1
+
+    def _buffer(self):
+        self._flush()
+        return self._text
+
+    def _flush(self):
+        if not self._pending:
+            return
+        edits = self._pending[::-1]
+        self._pending = []
+        pieces = []
+        end = 0
+        for a, b, text in edits:
+            pieces.append(self._text[end:a])
+            pieces.append(text)
+            end = b
+        pieces.append(self._text[end:])
+        self._text = "".join(pieces)
+        self._sel._shift([(a, b, len(text)) for a, b, text in edits])
+
+    def run_command(self, name, args=None):
+        """Run one of the plugin's TextCommands.
+        """
+        TextCommand.commands[name](self).run(Edit(), **(args or {}))
+
+
+class Edit(object):
+    """Like `sublime.Edit`; a token TextCommands pass around.
+    """
+
+
+class TextCommand(object):
+    """Like `sublime_plugin.TextCommand`. Keeps track of subclasses by name.
+    """
+
+    commands = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        TextCommand.commands[cls.__name__] = cls
+
+    def __init__(self, view):
+        self.view = view
+
+
+class ApplicationCommand(object):
+    """Like `sublime_plugin.ApplicationCommand`.
+    """
+
+
+class EventListener(object):
+    """Like `sublime_plugin.EventListener`.
+    """
+
+
+class AbortCommandError(Exception):
+    """Like `Six.lib.errors.AbortCommandError`.
+    """
+
+
+class ActiveViewAwareMixin(object):
+    """Like `Six.plugin.ActiveViewAwareMixin`.
+    """
+
+
+class OperatorWithoutMotion(object):
+    """Like `Six.lib.operators_internal.OperatorWithoutMotion`.
+    """
+
+    def __init__(self, name, *args, **kwargs):
+        self.name = name
+
+    def process(self, mode, state):
+        pass
+
+    def reset(self):
+        pass
+
+
+class Mode(object):
+    """Like `Six.lib.constants.Mode`.
+    """
+
+    Normal = "normal"
+    InternalNormal = "internal_normal"
+    Visual = "visual"
+    VisualLine = "visual_line"
+    VisualBlock = "visual_block"
+
+
+class EditOperation(object):
+    """Like `Six.lib.yank_registers.EditOperation`.
+    """
+
+    Other = "other"
+
+
+class Editor(object):
+    """Like the Six editor, keeping what's registered with it.
+    """
+
+    def __init__(self):
+        self.registered = []
+        self.mappings = self
+
+    def register(self, mode, keys):
+        def register(cls):
+            self.registered.append((mode, keys, cls))
+            return cls
+        return register
+
+    def add(self, mode, keys, target):
+        self.registered.append((mode, keys, target))
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install():
+    """Make the stand-ins importable as `sublime`, `sublime_plugin` and `Six`.
+
+    Modules that are importable already are left alone.
+    """
+    modules = {
+        "sublime": _module(
+            "sublime", Region=Region, Selection=Selection, Settings=Settings,
+            View=View, Edit=Edit, score_selector=lambda scope, selector: 0,
+            set_timeout=lambda callback, delay=0: callback(),
+            set_timeout_async=lambda callback, delay=0: callback(),
+            status_message=lambda message: None),
+        "sublime_plugin": _module(
+            "sublime_plugin", TextCommand=TextCommand,
+            ApplicationCommand=ApplicationCommand, EventListener=EventListener),
+        "Six": _module("Six", __path__=[]),
+        "Six.lib": _module("Six.lib", __path__=[]),
+        "Six._init_": _module("Six._init_", editor=Editor()),
+        "Six.lib.constants": _module("Six.lib.constants", Mode=Mode),
+        "Six.lib.errors": _module(
+            "Six.lib.errors", AbortCommandError=AbortCommandError),
+        "Six.lib.operators_internal": _module(
+            "Six.lib.operators_internal",
+            OperatorWithoutMotion=OperatorWithoutMotion),
+        "Six.lib.yank_registers": _module(
+            "Six.lib.yank_registers", EditOperation=EditOperation),
+        "Six.plugin": _module(
+            "Six.plugin", ActiveViewAwareMixin=ActiveViewAwareMixin),
+    }
+    for name, module in modules.items():
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            sys.modules[name] = module
+
+
+def unload_plugin():
+    """Forget the plugin package, so `load_plugin()` imports it again.
+
+    Returns what's needed to restore it with `restore_plugin()`.
+    """
+    modules = dict((name, module) for name, module in sys.modules.items()
+                   if name == PACKAGE or name.startswith(PACKAGE + "."))
+    for name in modules:
+        del sys.modules[name]
+    return modules, dict(TextCommand.commands)
+
+
+def restore_plugin(saved):
+    """Undo `unload_plugin()`.
+    """
+    modules, commands = saved
+    unload_plugin()
+    sys.modules.update(modules)
+    TextCommand.commands.clear()
+    TextCommand.commands.update(commands)
+
+
+def load_plugin():
+    """Import the plugin package headlessly and return its `surround` module.
+    """
+    install()
+    if PACKAGE not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE, os.path.join(ROOT, "__init__.py"),
+            submodule_search_locations=[ROOT])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = package
+        spec.loader.exec_module(package)
+    return importlib.import_module(PACKAGE + ".surround")
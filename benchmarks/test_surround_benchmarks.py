@@ -0,0 +1,179 @@
+"""Benchmarks for the Surround hot paths.
+
+They run on the headless view model, so they don't need Sublime Text.
+"""
+
+import importlib
+
+import pytest
+
+import headless
+
+# Settings to run bracket lookups through the index or by scanning the text.
+ENGINES = {
+    "index": {},
+    "scan": {"six_surround_index_budget": 0},
+}
+
+
+def _nested(depth):
+    return "(" * depth + "x" + ")" * depth
+
+
+def _open_view(surround, make_view, text, points, engine):
+    # Views are indexed in the background as they're loaded, before any command
+    # runs on them.
+    view = make_view(text, points, **ENGINES[engine])
+    surround._six_surround_index_listener().on_load(view)
+    return view
+
+
+def _run_command(view, name, args):
+    # Results are checked in teardowns, since reading the buffer applies the
+    # edits, which the headless view defers, and that would be measured too.
+    view.run_command(name, args)
+
+
+@pytest.mark.parametrize("length", [1000, 10000, 100000])
+def test_find_in_line_by_line_length(benchmark, surround, make_view, length):
+    # The sought character isn't there, so the whole line is searched.
+    view = make_view("a" * length, [length // 2])
+
+    result = benchmark(surround.find_in_line, view, "(")
+
+    assert result < 0
+
+
+@pytest.mark.parametrize("length", [2000000, 20000000])
+def test_find_in_line_in_large_file(benchmark, surround, make_view, length):
+    # The search gives up at the cap instead of reaching the end of the line.
+    view = make_view("a" * length, [length // 2])
+
+    result = benchmark(surround.find_in_line, view, "(")
+
+    assert result < 0
+
+
+@pytest.mark.parametrize("old", ["'", "("])
+@pytest.mark.parametrize("length", [2000000, 20000000])
+def test_delete_in_large_file(benchmark, make_view, old, length):
+    # There's no pair, so the search gives up at the cap instead of reading the
+    # whole line.
+    text = "a" * length
+
+    def setup():
+        view = make_view(text, [length // 2], six_surround_index_budget=0)
+        return (view, "_six_surround_delete", {"old": old}), {}
+
+    def check(view, name, args):
+        assert view.size() == length
+
+    benchmark.pedantic(_run_command, setup=setup, teardown=check, rounds=10)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("lines", [1000, 10000, 100000])
+def test_change_by_buffer_size(benchmark, surround, make_view, engine, lines):
+    line = "def f(a, b):\n    return g(a[0], {b: (1, 2)})\n"
+    text = line * (lines // 2)
+    # Inside g(...), halfway through the buffer.
+    middle = len(line) * (lines // 4) + line.index("g(") + 2
+
+    def setup():
+        view = _open_view(surround, make_view, text, [middle], engine)
+        return (view, "_six_surround_change", {"old": "(", "new": "["}), {}
+
+    def check(view, name, args):
+        assert view.substr(view.line(middle)).endswith("g[a[0], {b: (1, 2)}]")
+
+    benchmark.pedantic(_run_command, setup=setup, teardown=check, rounds=10)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("depth", [10, 100, 1000, 10000])
+def test_delete_by_nesting_depth(benchmark, surround, make_view, engine, depth):
+    text = _nested(depth)
+
+    def setup():
+        view = _open_view(surround, make_view, text, [depth], engine)
+        return (view, "_six_surround_delete", {"old": "(", "count": depth}), {}
+
+    def check(view, name, args):
+        assert view.substr(view.line(0)) == _nested(depth - 1)
+
+    benchmark.pedantic(_run_command, setup=setup, teardown=check, rounds=10)
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("old", ["'", "("])
+@pytest.mark.parametrize("cursors", [1, 100, 1000, 10000])
+def test_change_by_cursor_count(benchmark, surround, make_view, engine, old,
+                                cursors):
+    line = "x = f('a', (b, c))\n"
+    text = line * cursors
+    # Inside 'a' and (b, c).
+    offset = 7 if old == "'" else 13
+    points = [len(line) * i + offset for i in range(cursors)]
+
+    def setup():
+        view = _open_view(surround, make_view, text, points, engine)
+        return (view, "_six_surround_change", {"old": old, "new": "["}), {}
+
+    def check(view, name, args):
+        assert view.substr(view.line(0)).count("[") == 1
+
+    benchmark.pedantic(_run_command, setup=setup, teardown=check, rounds=5)
+
+
+@pytest.mark.parametrize("old", ["'", "("])
+@pytest.mark.parametrize("lines", [1000, 10000, 100000])
+def test_convert_by_buffer_size(benchmark, make_view, old, lines):
+    line = "x = f('a', (b, 'it\\'s'))\n"
+    text = line * lines
+
+    def setup():
+        view = make_view(text, [0])
+        return (view, "six_surround_convert", {"old": old, "new": "["}), {}
+
+    def check(view, name, args):
+        assert view.substr(view.line(0)).count("[") == 2
+
+    benchmark.pedantic(_run_command, setup=setup, teardown=check, rounds=5)
+
+
+@pytest.mark.parametrize("lines", [1000, 10000, 100000])
+def test_rewrite_file_by_size(benchmark, surround, tmp_path, lines):
+    cli = importlib.import_module(headless.PACKAGE + ".cli")
+    text = "x = f('a', (b, 'it\\'s'))\n" * lines
+    path = tmp_path / "file.py"
+
+    def setup():
+        path.write_text(text)
+
+    def run():
+        assert cli.rewrite_file(str(path), ("'", "'"), ("[", "]"))[1] == 2 * lines
+
+    benchmark.pedantic(run, setup=setup, rounds=5)
+
+
+def test_startup_import(benchmark, surround):
+    # Loading the plugin, as Sublime Text does at startup and on reloads.
+    def setup():
+        return (headless.unload_plugin(), ), {}
+
+    def run(saved):
+        headless.load_plugin()
+        return saved
+
+    benchmark.pedantic(run, setup=setup, teardown=headless.restore_plugin, rounds=20)
+
+
+@pytest.mark.parametrize("first", [True, False])
+def test_startup_surround(benchmark, surround, first):
+    # Defining the Six plugins, as sixrc does. Only the first call does work.
+    def setup():
+        if first:
+            surround._plugins = None
+
+    benchmark.pedantic(surround.surround, kwargs={"register": False}, setup=setup,
+                       rounds=20)
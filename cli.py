@@ -0,0 +1,223 @@
+"""Change or delete delimiters in files, outside Sublime Text.
+
+Every pair of the old delimiters in the files is changed or deleted, as
+six_surround_convert does in a view. Run it as a module from the directory
+containing this package, like::
+
+    $ python -m six.cli change "'" '"' 'src/**/*.py'
+    $ python -m six.cli delete b notes.txt
+
+Files are read through `mmap` and streamed through the matcher in chunks, spread
+over a pool of processes. Changed files are written to a temporary file first,
+which then replaces the original, so a file is never left half-written.
+"""
+
+import argparse
+import codecs
+import glob
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .delimiters import DEFAULTS
+from .pairs import find_all_pairs
+from .rewrite import apply_edits
+from .rewrite import change_edits
+from .rewrite import delete_edits
+from .tags import closing_tag
+
+# How many bytes to decode at a time.
+CHUNK_SIZE = 1024 * 1024
+
+
+def read_chunks(buffer, encoding, size=CHUNK_SIZE):
+    """Decode the bytes in `buffer` `size` bytes at a time.
+
+    Characters may straddle chunks of bytes; they're decoded with the next chunk.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for begin in range(0, len(buffer), size):
+        yield decoder.decode(buffer[begin:begin + size])
+    yield decoder.decode(b"", final=True)
+
+
+def rewrite_file(path, old, new, encoding="utf-8", dry_run=False):
+    """Change or delete every `old` pair in the file at `path`.
+
+    :param old:
+        The `(opener, closer)` tuple to look for.
+    :param new:
+        The `(opener, closer)` tuple to replace it with, or `None` to delete it.
+    :param dry_run:
+        If `True`, count pairs but leave the file alone.
+
+    Returns a tuple with the size of the file in bytes and the number of pairs.
+    """
+    opener, closer = old
+    temporary = None
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            # Empty files can't be mapped.
+            return 0, 0
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            pairs = [(a, a + len(opener), b, b + len(closer))
+                     for a, b in find_all_pairs(read_chunks(buffer, encoding),
+                                                opener, closer)]
+            if pairs and not dry_run:
+                if new is None:
+                    edits = delete_edits(pairs)
+                else:
+                    edits = change_edits(pairs, *new)
+                pieces = apply_edits(read_chunks(buffer, encoding), edits)
+                temporary = _write_temporary(path, pieces, encoding)
+
+    if temporary is not None:
+        # Windows can't replace a file that's still mapped.
+        os.replace(temporary, path)
+    return size, len(pairs)
+
+
+def _write_temporary(path, pieces, encoding):
+    # Write next to the original, so replacing it is atomic.
+    directory, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(prefix="." + name + ".", suffix=".tmp",
+                                     dir=directory or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # Edits cut the text into many small pieces; encode and write them
+            # in batches.
+            batch = []
+            size = 0
+            for piece in pieces:
+                batch.append(piece)
+                size += len(piece)
+                if size >= CHUNK_SIZE:
+                    f.write("".join(batch).encode(encoding))
+                    batch = []
+                    size = 0
+            f.write("".join(batch).encode(encoding))
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(path, temporary)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return temporary
+
+
+def expand_paths(patterns):
+    """Return the files matching `patterns`, without duplicates, in order.
+
+    Patterns may use ``**`` to match any number of directories.
+    """
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def get_delimiters(key, new=False):
+    """Return the `(opener, closer)` tuple for a delimiter key, as in cs.
+
+    New delimiters may also be tags, like "<em>". Returns `None` if the key is
+    unknown.
+    """
+    if key in DEFAULTS:
+        return DEFAULTS[key]
+    if new and closing_tag(key) is not None:
+        return key, closing_tag(key)
+    return None
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m six.cli",
+        description="Change or delete every pair of delimiters in files.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="how many processes to use (default: one per CPU)")
+    parser.add_argument("--encoding", default="utf-8",
+                        help="the encoding of the files (default: utf-8)")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="count pairs without changing files")
+
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    change = commands.add_parser("change", help="change delimiters, as cs does")
+    change.add_argument("old", help="the key for the delimiters to change")
+    change.add_argument("new", help="the key for the new delimiters, or a tag")
+    change.add_argument("paths", nargs="+", metavar="path",
+                        help="files or glob patterns")
+    delete = commands.add_parser("delete", help="delete delimiters, as ds does")
+    delete.add_argument("old", help="the key for the delimiters to delete")
+    delete.add_argument("paths", nargs="+", metavar="path",
+                        help="files or glob patterns")
+
+    args = parser.parse_args(argv)
+    args.old_delimiters = get_delimiters(args.old)
+    if args.old_delimiters is None:
+        parser.error("unknown delimiter: %s" % args.old)
+    args.new_delimiters = None
+    if args.command == "change":
+        args.new_delimiters = get_delimiters(args.new, new=True)
+        if args.new_delimiters is None:
+            parser.error("unknown delimiter: %s" % args.new)
+    return args
+
+
+def main(argv=None):
+    """Run the command line tool. Returns the exit status.
+    """
+    args = _parse_args(argv)
+    paths = expand_paths(args.paths)
+
+    start = time.perf_counter()
+    work = [(path, args.old_delimiters, args.new_delimiters, args.encoding,
+             args.dry_run) for path in paths]
+    if args.jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(args.jobs) as executor:
+            futures = [executor.submit(rewrite_file, *job) for job in work]
+            results = _collect(paths, (future.result for future in futures))
+    else:
+        results = _collect(paths, (lambda job=job: rewrite_file(*job)
+                                   for job in work))
+    elapsed = max(time.perf_counter() - start, 1e-9)
+
+    changed = sum(1 for size, pairs in results if pairs)
+    errors = len(paths) - len(results)
+    total_size = sum(size for size, pairs in results)
+    megabytes = total_size / (1024 * 1024)
+    print("%d files, %d with pairs%s, %d pairs, %.1f MB in %.2f s "
+          "(%.1f files/s, %.1f MB/s)%s" % (
+              len(paths), changed, " (dry run)" if args.dry_run else "",
+              sum(pairs for size, pairs in results), megabytes, elapsed,
+              len(paths) / elapsed, megabytes / elapsed,
+              ", %d errors" % errors if errors else ""),
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+def _collect(paths, results):
+    # Call each function in `results` for the result for each path, reporting
+    # files that couldn't be read or written.
+    collected = []
+    for path, result in zip(paths, results):
+        try:
+            collected.append(result())
+        except (OSError, UnicodeError) as e:
+            print("%s: %s" % (path, e), file=sys.stderr)
+    return collected
+
+
+if __name__ == "__main__":
+    sys.exit(main())
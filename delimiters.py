@@ -0,0 +1,109 @@
+"""The table of delimiters the Surround plugin knows.
+
+Like `pairs`, nothing in here talks to Sublime Text.
+"""
+
+import re
+
+# The delimiters Surround knows out of the box, by the key typed for them.
+DEFAULTS = {
+    "'": ("'", "'"),
+    '"': ('"', '"'),
+    "(": ("(", ")"),
+    ")": ("(", ")"),
+    "[": ("[", "]"),
+    "]": ("[", "]"),
+    r"{": ("{", "}"),
+    r"}": ("{", "}"),
+    ">": ("<", ">"),
+    # Aliases from vim-surround.
+    "b": ("(", ")"),
+    "B": ("{", "}"),
+    "r": ("[", "]"),
+    "a": ("<", ">"),
+}
+
+# Compiled patterns matching any of some delimiters, keyed by the delimiters.
+_patterns = {}
+
+
+def compile_delimiters(delimiters):
+    """Return a pattern matching any of `delimiters` in a single pass.
+
+    Longer delimiters are tried first, so "{%" wins over "{". Patterns are
+    compiled once for each set of delimiters.
+    """
+    key = frozenset(delimiters)
+    try:
+        return _patterns[key]
+    except KeyError:
+        pattern = re.compile("|".join(
+            re.escape(d) for d in sorted(key, key=lambda d: (-len(d), d))))
+        _patterns[key] = pattern
+        return pattern
+
+
+class Delimiters(object):
+    """Maps the keys users type for delimiters to `(opener, closer)` tuples.
+
+    Several keys may map to the same delimiters, like "(", ")" and "b" do.
+    Delimiters may be longer than a character, like "/*" and "*/".
+    """
+
+    def __init__(self, pairs=None):
+        self._pairs = {}
+        # Incremented on every change, so users can tell when to refresh
+        # anything derived from the table.
+        self.version = 0
+        self._balanced = None
+        for key, value in (pairs or {}).items():
+            self.add(key, *value)
+
+    def add(self, key, opener, closer=None):
+        """Make `key` stand for `opener` and `closer`.
+
+        If `closer` is omitted, it's the same as `opener`, as for quotes.
+        """
+        if not key or not opener:
+            raise ValueError("delimiters and their keys can't be empty")
+        self._pairs[key] = opener, opener if closer is None else closer
+        self._changed()
+
+    def remove(self, key):
+        """Make `key` stand for no delimiters.
+        """
+        del self._pairs[key]
+        self._changed()
+
+    def _changed(self):
+        self.version += 1
+        self._balanced = None
+
+    def __getitem__(self, key):
+        return self._pairs[key]
+
+    def __contains__(self, key):
+        return key in self._pairs
+
+    def __iter__(self):
+        return iter(self._pairs)
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def get(self, key, default=None):
+        return self._pairs.get(key, default)
+
+    def items(self):
+        return self._pairs.items()
+
+    @property
+    def balanced(self):
+        """The `(opener, closer)` tuples with different opener and closer, sorted.
+
+        These can nest.
+        """
+        if self._balanced is None:
+            self._balanced = sorted(
+                set(pair for pair in self._pairs.values() if pair[0] != pair[1]))
+        return self._balanced
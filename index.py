@@ -0,0 +1,475 @@
+"""Per-view index of bracket positions for the Surround plugin.
+
+Like `pairs`, nothing in here talks to Sublime Text. The view code builds indexes
+from buffer text and keeps them in an `IndexCache`, keyed by buffer id and checked
+against the view's change count.
+
+Entries are kept in parallel arrays of machine integers rather than in objects
+of their own, so an index takes a few bytes per bracket, even for big files.
+`Bracket` records give a view of a single entry.
+"""
+
+import sys
+
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from collections import OrderedDict
+
+from .delimiters import compile_delimiters
+from .pairs import CHUNK_SIZE
+from .pairs import first_depth
+
+# Depth changes for openers and closers, stored as 1 and 0, scanning forwards and
+# backwards, as signed bytes; see `_Table.scan`.
+_AHEAD = bytes.maketrans(b"\x00\x01", b"\xff\x01")
+_BACK = bytes.maketrans(b"\x00\x01", b"\x01\xff")
+
+
+class BracketIndex(object):
+    """Positions of every bracket in a buffer, with their matching partners.
+
+    Each kind of bracket is matched independently of the others, just like
+    `pairs.find_enclosing` does.
+    """
+
+    def __init__(self, text, brackets, change_count=None):
+        """
+        :param text:
+            The whole buffer.
+        :param brackets:
+            A sequence of `(opener, closer)` tuples. Openers and closers may be
+            longer than a character, but not span lines.
+        :param change_count:
+            The view's change count `text` corresponds to.
+        """
+        self.brackets = brackets
+        self.change_count = change_count
+        # Kinds whose brackets need pairing up again.
+        self._unmatched = set()
+        # Maps each bracket to its kind, the opener.
+        self._kinds = {}
+        # Maps each kind to its entries.
+        self._tables = {}
+        for opener, closer in brackets:
+            self._kinds[opener] = self._kinds[closer] = opener
+            self._tables[opener] = _Table()
+
+        # Brackets of all kinds are found in a single pass.
+        self._pattern = compile_delimiters(self._kinds)
+        for kind, tokens in self._tokenize(text, 0).items():
+            table = self._tables[kind]
+            table.positions, table.openers = tokens
+            table.match()
+
+    def _tokenize(self, text, begin):
+        """Find the brackets in `text`, which starts at point `begin`.
+
+        Returns a dictionary mapping each kind to a tuple with arrays of the
+        bracket positions and of whether each one is an opener.
+        """
+        tokens = dict((kind, (array("q"), array("b"))) for kind in self._tables)
+        for match in self._pattern.finditer(text):
+            bracket = match.group()
+            positions, openers = tokens[self._kinds[bracket]]
+            positions.append(begin + match.start())
+            openers.append(bracket in self._tables)
+        return tokens
+
+    def update(self, changes, read, change_count):
+        """Patch the index after the buffer changed.
+
+        Only the edited lines are tokenized again. Shifting the brackets after
+        each edit is deferred until needed, so it's cheap to edit the same spot
+        repeatedly, as when typing. Brackets of the kinds that were added or
+        removed aren't paired up again; `enclosing` scans outwards for their
+        pairs instead.
+
+        :param changes:
+            A sequence of `(a, b, text)` tuples, in the order they were applied
+            to the buffer. Each one replaced the text between points `a` and `b`
+            with `text`.
+        :param read:
+            A callable taking two points and returning a tuple with the bounds of
+            the lines spanning them, and the text in them, as it is now.
+        :param change_count:
+            The view's change count after the changes.
+        """
+        touched = set()
+        # Inserted spans, in current coordinates.
+        dirty = []
+        for a, b, text in changes:
+            delta = len(text) - (b - a)
+            for kind, table in self._tables.items():
+                if table.replace(a, b, array("q"), array("b")):
+                    touched.add(kind)
+                table.shift(table.bisect_left(a), delta)
+            dirty = [(x if x < b else x + delta, y if y < b else y + delta)
+                     for x, y in dirty if not (a <= x and y <= b)]
+            dirty.append((a, a + len(text)))
+
+        for begin, end in _merge(dirty):
+            lines_begin, lines_end, text = read(begin, end)
+            for kind, (positions, openers) in self._tokenize(text,
+                                                             lines_begin).items():
+                table = self._tables[kind]
+                if table.replace(lines_begin, lines_end, positions, openers):
+                    touched.add(kind)
+
+        self._unmatched |= touched
+        self.change_count = change_count
+
+    def __len__(self):
+        return sum(len(table.positions) for table in self._tables.values())
+
+    @property
+    def nbytes(self):
+        """Memory used by the entries of the index, in bytes.
+        """
+        return sum(table.nbytes for table in self._tables.values())
+
+    def entries(self, opener):
+        """Return the brackets of the `opener` kind, as `Bracket` records in
+        order.
+        """
+        table = self._match(opener)
+        return [Bracket(table, i) for i in range(len(table.positions))]
+
+    def _match(self, opener):
+        # Return the table for the `opener` kind, paired up.
+        table = self._tables[opener]
+        if opener in self._unmatched:
+            table.match()
+            self._unmatched.discard(opener)
+        return table
+
+    def enclosing(self, pt, opener, count=1):
+        """Find the balanced pair of the `opener` kind enclosing `pt`.
+
+        A bracket right at `pt` belongs to the innermost pair.
+
+        :param count:
+            Find the `count`-th enclosing pair instead of the innermost one.
+
+        Returns a tuple with the positions of the opening and closing brackets,
+        or `None` if `pt` isn't enclosed by such a pair.
+        """
+        table = self._tables[opener]
+        if opener in self._unmatched:
+            # Pairing up the whole table takes time proportional to its size,
+            # and scanning only to the distance of the pair.
+            return table.scan(pt, count)
+
+        i = table.bisect_right(pt) - 1
+        if i < 0:
+            return None
+
+        if table.openers[i]:
+            # Any closer for it must be after pt.
+            k = i
+        elif table.partners[i] >= 0 and table.position(i) == pt:
+            k = table.partners[i]
+        else:
+            k = table.parents[i]
+
+        while k >= 0:
+            # Unbalanced openers don't count.
+            if table.partners[k] >= 0:
+                count -= 1
+                if count == 0:
+                    return table.position(k), table.position(table.partners[k])
+            k = table.parents[k]
+        return None
+
+    def find(self, character, start, stop, forward=True):
+        """Find `character` between `start` and `stop`, like `find_in_line` does.
+
+        Returns a negative integer if the character wasn't found.
+        """
+        table = self._tables[self._kinds[character]]
+        is_opener = character in self._tables
+        if forward:
+            i = table.bisect_left(start)
+            while i < len(table.positions) and table.position(i) < stop:
+                if table.openers[i] == is_opener:
+                    return table.position(i)
+                i += 1
+        else:
+            i = table.bisect_right(start) - 1
+            while i >= 0 and table.position(i) >= stop:
+                if table.openers[i] == is_opener:
+                    return table.position(i)
+                i -= 1
+        return -1
+
+    def __contains__(self, character):
+        return character in self._kinds
+
+
+class Bracket(object):
+    """A bracket in a `BracketIndex`.
+
+    Records read the columns of the index as their attributes are accessed, so
+    they cost nothing until then, but are only valid until the index changes.
+    """
+
+    __slots__ = ("_table", "_i")
+
+    def __init__(self, table, i):
+        self._table = table
+        self._i = i
+
+    @property
+    def position(self):
+        return self._table.position(self._i)
+
+    @property
+    def is_opener(self):
+        return bool(self._table.openers[self._i])
+
+    @property
+    def partner(self):
+        """The position of the matching bracket, or `None` if unbalanced.
+        """
+        k = self._table.partners[self._i]
+        return None if k < 0 else self._table.position(k)
+
+    def __repr__(self):
+        return "Bracket(position=%d, is_opener=%s, partner=%s)" % (
+            self.position, self.is_opener, self.partner)
+
+
+class _Table(object):
+    """Entries for one kind of bracket, sorted by position.
+
+    Entries are spread over parallel arrays, one per field. Shifting positions
+    after an edit is deferred: entries from index `gap` on are `delta` characters
+    further than stored. Moving the gap only touches the entries between the old
+    and the new gap. Partners and parents are only valid after `match`.
+    """
+
+    __slots__ = ("positions", "openers", "partners", "parents", "gap", "delta")
+
+    def __init__(self):
+        self.positions = array("q")
+        # Whether each entry is an opener.
+        self.openers = array("b")
+        # Index of the matching entry, or -1 if unbalanced.
+        self.partners = array("q")
+        # Index of the innermost opener enclosing each entry, or -1.
+        self.parents = array("q")
+        self.gap = 0
+        self.delta = 0
+
+    @property
+    def nbytes(self):
+        return sum(sys.getsizeof(column) for column in (
+            self.positions, self.openers, self.partners, self.parents))
+
+    def position(self, i):
+        return self.positions[i] + (self.delta if i >= self.gap else 0)
+
+    def bisect_left(self, pt):
+        i = bisect_left(self.positions, pt, 0, self.gap)
+        if i < self.gap:
+            return i
+        return bisect_left(self.positions, pt - self.delta, self.gap)
+
+    def bisect_right(self, pt):
+        i = bisect_right(self.positions, pt, 0, self.gap)
+        if i < self.gap:
+            return i
+        return bisect_right(self.positions, pt - self.delta, self.gap)
+
+    def shift(self, i, delta):
+        """Shift entries from index `i` on by `delta` characters.
+        """
+        if not delta:
+            return
+        if self.delta:
+            self._move_gap(i)
+        else:
+            self.gap = i
+        self.delta += delta
+
+    def replace(self, a, b, positions, openers):
+        """Replace the entries between points `a` and `b` with new ones.
+
+        :param positions:
+            An `array("q")` with the positions of the new entries.
+        :param openers:
+            An `array("b")` telling whether each new entry is an opener.
+
+        Returns `True` if anything changed. Partners need updating then.
+        """
+        i = self.bisect_left(a)
+        j = self.bisect_left(b)
+        if (openers == self.openers[i:j] and
+                positions == array("q", (self.position(k) for k in range(i, j)))):
+            return False
+
+        # Entries before the gap are stored as they are, like the new ones.
+        self._move_gap(j)
+        self.positions[i:j] = positions
+        self.openers[i:j] = openers
+        self.gap = i + len(positions)
+        return True
+
+    def _move_gap(self, k):
+        # Only the entries between the old and the new gap are touched.
+        if self.delta:
+            positions = self.positions
+            if k > self.gap:
+                positions[self.gap:k] = array("q", [
+                    pt + self.delta for pt in positions[self.gap:k]])
+            elif k < self.gap:
+                positions[k:self.gap] = array("q", [
+                    pt - self.delta for pt in positions[k:self.gap]])
+        self.gap = k
+
+    def scan(self, pt, count=1):
+        """Find the `count`-th pair enclosing `pt` without pairing up the
+        brackets, as `BracketIndex.enclosing` does.
+
+        Entries are scanned outwards from `pt` and the scans stop at the pair,
+        like those of `pairs.find_enclosing` do.
+        """
+        j = self.bisect_right(pt)
+        if j and not self.openers[j - 1] and self.position(j - 1) == pt:
+            # A closer right at pt belongs to the innermost pair.
+            j -= 1
+
+        a = self._scan(j, count, forward=False)
+        if a < 0:
+            return None
+        b = self._scan(j, count, forward=True)
+        if b < 0:
+            return None
+        return self.position(a), self.position(b)
+
+    def _scan(self, start, count, forward):
+        # Find the `count`-th unmatched closer from entry `start` on, or opener
+        # before it, where the depth first reaches -count. Depths are summed a
+        # chunk of entries at a time, and chunks double in size.
+        depth = 0
+        size = CHUNK_SIZE
+        begin, end = (start, len(self.openers)) if forward else (0, start)
+        while begin < end:
+            if forward:
+                a, b = begin, min(begin + size, end)
+                deltas = self.openers[a:b].tobytes().translate(_AHEAD)
+            else:
+                a, b = max(end - size, begin), end
+                deltas = self.openers[a:b].tobytes().translate(_BACK)[::-1]
+
+            i, total = first_depth(deltas, -count - depth)
+            if i >= 0:
+                return a + i if forward else b - 1 - i
+            depth += total
+
+            if forward:
+                begin = b
+            else:
+                end = a
+            size *= 2
+        return -1
+
+    def match(self):
+        """Pair up the brackets.
+        """
+        self.partners = partners = array("q", [-1]) * len(self.positions)
+        self.parents = parents = array("q", [-1]) * len(self.positions)
+        stack = []
+        for i, is_opener in enumerate(self.openers):
+            if is_opener:
+                parents[i] = stack[-1] if stack else -1
+                stack.append(i)
+            elif stack:
+                j = stack.pop()
+                partners[i], partners[j] = j, i
+                parents[i] = stack[-1] if stack else -1
+
+
+class IndexCache(object):
+    """Bracket indexes for many buffers, evicted in LRU order.
+    """
+
+    def __init__(self, budget):
+        """
+        :param budget:
+            How many bytes all indexes together may use. The most recently used
+            index is kept even if it exceeds the budget on its own.
+        """
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self._indexes = OrderedDict()
+
+    def get(self, buffer_id, change_count):
+        """Return the index for the buffer, if it's up to date.
+
+        Stale indexes are dropped.
+        """
+        index = self._indexes.get(buffer_id)
+        if index is not None and index.change_count == change_count:
+            self._indexes.move_to_end(buffer_id)
+            self.hits += 1
+            return index
+
+        self.misses += 1
+        if index is not None:
+            del self._indexes[buffer_id]
+        return None
+
+    def peek(self, buffer_id, change_count=None):
+        """Like `get`, but doesn't count as a use of the index.
+
+        If `change_count` is `None`, return the index even if it's stale.
+        """
+        index = self._indexes.get(buffer_id)
+        if index is not None and change_count in (None, index.change_count):
+            return index
+        return None
+
+    def put(self, buffer_id, index):
+        self._indexes[buffer_id] = index
+        self._indexes.move_to_end(buffer_id)
+        self._evict()
+
+    def discard(self, buffer_id):
+        self._indexes.pop(buffer_id, None)
+
+    @property
+    def nbytes(self):
+        return sum(index.nbytes for index in self._indexes.values())
+
+    @property
+    def stats(self):
+        """Hit and miss counters, and memory use.
+        """
+        total = self.hits + self.misses
+        return {
+            "views": len(self._indexes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "nbytes": self.nbytes,
+        }
+
+    def _evict(self):
+        nbytes = self.nbytes
+        while nbytes > self.budget and len(self._indexes) > 1:
+            _, index = self._indexes.popitem(last=False)
+            nbytes -= index.nbytes
+
+
+def _merge(spans):
+    """Merge overlapping or adjacent spans, returning them in ascending order.
+    """
+    merged = []
+    for begin, end in sorted(spans):
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+    return merged
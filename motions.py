@@ -0,0 +1,101 @@
+"""Motions and text objects for the Surround ys operator.
+
+Like `pairs`, nothing in here talks to Sublime Text. Motions are resolved within
+a single line, which is all the text they get.
+"""
+
+import re
+
+# Runs of characters of the same class: words, other non-blanks and blanks.
+_WORDS = re.compile(r"\w+|[^\w\s]+|\s+")
+# Runs of non-blanks and blanks.
+_BIG_WORDS = re.compile(r"\S+|\s+")
+
+# Names of the supported motions and text objects, as typed after ys.
+MOTIONS = ("iw", "aw", "iW", "aW", "w", "W", "e", "E", "$", "s")
+
+
+def find_motion(line, offset, motion, count=1):
+    """Find the span of text a motion or text object covers.
+
+    :param line:
+        The text of the caret line, without the newline.
+    :param offset:
+        The caret offset into `line`.
+    :param motion:
+        One of `MOTIONS`. `s` is the whole line, minus leading blanks.
+    :param count:
+        How many times to repeat the motion. Text objects and `s` ignore it.
+
+    Blanks at the end of the span are left out, like vim-surround does, unless
+    the span is all blanks. So ysw( on "foo bar" produces "(foo) bar".
+
+    Returns a tuple with the offsets of the span, or `None` if there's nothing to
+    cover.
+    """
+    span = _find_span(line, offset, motion, count)
+    if span is None:
+        return None
+
+    begin, end = span
+    trimmed = len(line[begin:end].rstrip())
+    return (begin, begin + trimmed) if trimmed else span
+
+
+def _find_span(line, offset, motion, count):
+    if motion == "s":
+        begin = len(line) - len(line.lstrip())
+        return (begin, len(line)) if begin < len(line) else None
+
+    if motion == "$":
+        return (offset, len(line)) if offset < len(line) else None
+
+    runs = [m.span() for m in (_BIG_WORDS if motion[-1] in "WE" else _WORDS)
+            .finditer(line)]
+    i = _run_at(runs, offset)
+    if i < 0:
+        return None
+
+    if motion in ("iw", "iW"):
+        return runs[i]
+
+    if motion in ("aw", "aW"):
+        begin, end = runs[i]
+        if line[begin].isspace():
+            # Blanks, then the word after them.
+            return (begin, runs[i + 1][1]) if i + 1 < len(runs) else runs[i]
+        if i + 1 < len(runs) and line[runs[i + 1][0]].isspace():
+            return begin, runs[i + 1][1]
+        if i > 0 and line[runs[i - 1][0]].isspace():
+            return runs[i - 1][0], end
+        return runs[i]
+
+    if motion in ("w", "W"):
+        # Up to the start of the count-th word after the caret.
+        j = i
+        for _ in range(count):
+            j += 1
+            while j < len(runs) and line[runs[j][0]].isspace():
+                j += 1
+            if j >= len(runs):
+                return offset, len(line)
+        return offset, runs[j][0]
+
+    # e, E: up to the end of the count-th word end after the caret.
+    last = offset
+    for _ in range(count):
+        j = i
+        while j < len(runs) and (line[runs[j][0]].isspace() or
+                                 runs[j][1] - 1 <= last):
+            j += 1
+        if j >= len(runs):
+            return offset, len(line)
+        last = runs[j][1] - 1
+    return offset, last + 1
+
+
+def _run_at(runs, offset):
+    for i, (begin, end) in enumerate(runs):
+        if begin <= offset < end:
+            return i
+    return -1
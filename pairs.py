@@ -0,0 +1,471 @@
+"""Delimiter pair matching for the Surround plugin.
+
+Nothing in here talks to Sublime Text: functions take plain strings and offsets
+into them, so the view code can read text once and do all the work in memory.
+"""
+
+import itertools
+import re
+
+from array import array
+from bisect import bisect_right
+
+try:
+    import numpy
+except ImportError:
+    # Sublime Text doesn't ship it; the standard library will do.
+    numpy = None
+
+# Compiled patterns matching either delimiter of a pair, keyed by the pair.
+_patterns = {}
+
+# Translation tables for `_scan_depths`, keyed by the pair.
+_tables = {}
+
+# How many characters to tokenize at first when scanning backwards, or when
+# scanning in either direction with `_scan_depths`. Each chunk doubles the size
+# of the previous one.
+CHUNK_SIZE = 256
+
+# How many delimiters a chunk must have for NumPy to sum their depths, if it's
+# available. It only pays off for large chunks.
+NUMPY_THRESHOLD = 4096
+
+
+def _pattern(opener, closer):
+    try:
+        return _patterns[opener, closer]
+    except KeyError:
+        pattern = re.compile("|".join(re.escape(d) for d in (opener, closer)))
+        _patterns[opener, closer] = pattern
+        return pattern
+
+
+def _all_pairs_pattern(opener, closer):
+    # Escapes come first, so escaped delimiters are consumed with them. Quotes
+    # pair within a line, so line breaks are tokens too, even escaped ones.
+    key = opener, closer, "all"
+    try:
+        return _patterns[key]
+    except KeyError:
+        alternatives = [r"\\[^\n]"]
+        if opener == closer:
+            alternatives.append("\n")
+        alternatives.extend(re.escape(d) for d in sorted(set((opener, closer)),
+                                                         key=len, reverse=True))
+        pattern = _patterns[key] = re.compile("|".join(alternatives))
+        return pattern
+
+
+def find_all_pairs(chunks, opener, closer):
+    """Find every `opener`/`closer` pair in a text read a chunk at a time.
+
+    The text is tokenized in a single pass, so this takes time proportional to
+    its length and only keeps a chunk in memory, plus the unclosed openers.
+    Delimiters escaped with a backslash are skipped. Balanced delimiters pair
+    taking nesting into account, and unmatched ones are skipped. Quotes, where
+    `opener` and `closer` are the same, pair in order within a line.
+
+    :param chunks:
+        An iterable of strings making up the text. Delimiters and escapes may
+        straddle chunks.
+
+    Yields `(a, b)` tuples with the offsets into the text of the opening and
+    closing delimiters, in the order pairs close.
+    """
+    pattern = _all_pairs_pattern(opener, closer)
+    quotes = opener == closer
+    # Tokens starting closer than this to the end of a chunk may continue in the
+    # next one.
+    overlap = max(len(opener), len(closer), 2) - 1
+
+    # Offsets of unclosed openers. Quotes have one at most.
+    open_ = []
+    # Text not tokenized yet, and its offset into the whole text.
+    pending = ""
+    offset = 0
+    for chunk in itertools.chain(chunks, (None, )):
+        if chunk is None:
+            text = pending
+            stop = len(text)
+        else:
+            text = pending + chunk
+            stop = max(len(text) - overlap, 0)
+
+        resume = stop
+        for match in pattern.finditer(text):
+            start = match.start()
+            if start >= stop:
+                break
+            resume = match.end()
+            token = match.group()
+            if token[0] == "\\":
+                # An escape.
+                continue
+            if token == "\n":
+                del open_[:]
+            elif quotes:
+                if open_:
+                    yield open_.pop(), offset + start
+                else:
+                    open_.append(offset + start)
+            elif token == opener:
+                open_.append(offset + start)
+            elif open_:
+                yield open_.pop(), offset + start
+
+        resume = max(resume, stop)
+        pending = text[resume:]
+        offset += resume
+
+
+def find_pairs(text, offsets, opener, closer, count=1, bound=None, ignore=None):
+    """Find the `opener`/`closer` pair around each of `offsets`.
+
+    Quotes, where `opener` and `closer` are the same, are looked for with
+    `find_quotes()` and must be in the line of the offset. Other delimiters are
+    looked for with `find_enclosing()`.
+
+    :param bound:
+        If given, don't look further than this many characters at each side of
+        an offset for balanced delimiters.
+
+    The rest of the parameters are as for `find_enclosing()`; `count` and
+    `ignore` only apply to balanced delimiters, since quotes don't nest.
+
+    Returns a sorted list of `(a, a_end, b, b_end)` tuples, where `a` and `a_end`
+    are the offsets where the opening delimiter begins and ends, and `b` and
+    `b_end` those for the closing one. Offsets without a pair are skipped and
+    offsets inside the same pair yield a single tuple.
+    """
+    pairs = set()
+    for offset in offsets:
+        if opener == closer:
+            pair = find_quotes(text, offset, opener)
+        elif bound is None:
+            pair = find_enclosing(text, offset, opener, closer, count=count,
+                                  ignore=ignore)
+        else:
+            pair = find_enclosing(text, offset, opener, closer,
+                                  lo=max(offset - bound, 0), hi=offset + bound,
+                                  count=count, ignore=ignore)
+        if pair is not None:
+            a, b = pair
+            pairs.add((a, a + len(opener), b, b + len(closer)))
+    return sorted(pairs)
+
+
+def find_quotes(text, offset, quote):
+    """Find the pair of `quote`s for `offset`, in its line.
+
+    Quotes pair in order from the start of the line, skipping escaped ones, as
+    `quote_pairs()` finds them. That's the pair around `offset`, or the next one
+    in the line if `offset` is between pairs.
+
+    Returns a tuple with the offsets of the opening and closing quotes, or `None`
+    if they weren't found.
+    """
+    begin = text.rfind("\n", 0, offset) + 1
+    end = text.find("\n", offset)
+    if end < 0:
+        end = len(text)
+
+    pair = find_quote_pair(quote_pairs(text[begin:end], quote), offset - begin,
+                           len(quote))
+    if pair is None:
+        return None
+    return begin + pair[0], begin + pair[1]
+
+
+def quote_pairs(text, quote):
+    """Return the offsets of the `quote`s that pair in `text`.
+
+    Quotes pair in order within each line. Offsets are in order, alternating
+    opening and closing quotes, in an `array("q")`. Quotes escaped with a
+    backslash and the last unpaired one in a line are left out.
+    """
+    offsets = array("q")
+    opening = -1
+    for match in _all_pairs_pattern(quote, quote).finditer(text):
+        token = match.group()
+        if token == quote:
+            if opening < 0:
+                opening = match.start()
+            else:
+                offsets.extend((opening, match.start()))
+                opening = -1
+        elif token == "\n":
+            opening = -1
+    return offsets
+
+
+def find_quote_pair(pairs, offset, size=1, hi=None):
+    """Find the pair of quotes for `offset` by bisecting `pairs`.
+
+    :param pairs:
+        Offsets as `quote_pairs()` returns.
+    :param size:
+        The length of the quote.
+    :param hi:
+        Where the line of `offset` ends. Pairs after it are ignored.
+
+    Returns the pair around `offset`, or the next one in the line if there's
+    none, as a tuple with the offsets of the opening and closing quotes. Returns
+    `None` if there are no more pairs.
+    """
+    i = bisect_right(pairs, offset)
+    if i % 2:
+        # Between an opening and a closing quote.
+        return pairs[i - 1], pairs[i]
+    if i and offset < pairs[i - 1] + size:
+        # On a closing quote.
+        return pairs[i - 2], pairs[i - 1]
+    if i < len(pairs) and (hi is None or pairs[i] < hi):
+        return pairs[i], pairs[i + 1]
+    return None
+
+
+def find_call_name(text, offset):
+    """Find the name of the function called with the parenthesis at `offset`, as
+    in "f(x)".
+
+    The name is scanned backwards from `offset`, a character at a time, and made
+    of word characters.
+
+    Returns the offset where the name begins, which is `offset` if there's none.
+    """
+    i = offset
+    while i > 0 and (text[i - 1].isalnum() or text[i - 1] == "_"):
+        i -= 1
+    return i
+
+
+def find_enclosing(text, offset, opener, closer, lo=0, hi=None, count=1,
+                   ignore=None):
+    """Find the balanced `opener`/`closer` pair enclosing `offset`.
+
+    Nested pairs between the offset and the enclosing pair are skipped by keeping
+    a depth counter while scanning outwards, once in each direction. Every
+    enclosing level is passed on the way out, so finding an outer pair takes a
+    single scan too. Scans stop at the pair, so they take time proportional to
+    its distance from `offset`, not to the bounds. A delimiter at `offset`, or
+    around it, belongs to the innermost pair.
+
+    Delimiters are visited one by one only if some may be ignored, or if they
+    are longer than a character or don't fit in a byte. Otherwise, depths are
+    computed a chunk at a time as prefix sums, which is several times faster.
+
+    :param text:
+        The text to search.
+    :param offset:
+        The offset into `text` to search around.
+    :param opener:
+        The opening delimiter. It must be different from `closer`.
+    :param closer:
+        The closing delimiter.
+    :param lo:
+        Don't look further back than this offset.
+    :param hi:
+        Don't look further ahead than this offset.
+    :param count:
+        Find the `count`-th enclosing pair instead of the innermost one.
+    :param ignore:
+        If given, a callable taking the offset of a delimiter and returning `True`
+        if the delimiter must be ignored.
+
+    Returns a tuple with the offsets of the opening and closing delimiters, or
+    `None` if the pair wasn't found.
+    """
+    hi = len(text) if hi is None else hi
+    pattern = _pattern(opener, closer)
+
+    # Where the backwards scan ends and the forwards one starts.
+    start = ahead = offset
+    for k in range(len(opener)):
+        if offset - k >= lo and text.startswith(opener, offset - k):
+            # Make sure the backwards scan sees the opener under the caret, even
+            # if the caret is in the middle of it, and the forwards one doesn't.
+            start = offset - k + len(opener)
+            ahead = start if k == 0 else offset
+            break
+    else:
+        for k in range(1, len(closer)):
+            if offset - k >= lo and text.startswith(closer, offset - k):
+                # Likewise for the forwards scan and a closer under the caret.
+                ahead = offset - k
+                break
+
+    if ignore is None and _has_depth_tables(opener, closer):
+        a = _scan_depths(text, opener, closer, lo, start, count, forward=False)
+        if a < 0:
+            return None
+        b = _scan_depths(text, opener, closer, ahead, hi, count, forward=True)
+        if b < 0:
+            return None
+        return a, b
+
+    a = _scan_back(text, pattern, opener, closer, lo, start, count, ignore)
+    if a < 0:
+        return None
+
+    b = _scan_ahead(text, pattern, closer, ahead, hi, count, ignore)
+    if b < 0:
+        return None
+
+    return a, b
+
+
+def _scan_back(text, pattern, opener, closer, lo, end, count, ignore):
+    # Tokenize chunks of doubling size from the end backwards, so stopping at the
+    # pair saves tokenizing the rest. Delimiters may extend past their chunk.
+    overlap = max(len(opener), len(closer)) - 1
+    stop = end
+    size = CHUNK_SIZE
+    depth = 0
+    while end > lo:
+        begin = max(end - size, lo)
+        matches = list(pattern.finditer(text, begin, min(end + overlap, stop)))
+        for match in reversed(matches):
+            if overlap and match.start() >= end:
+                # Seen in the previous chunk.
+                continue
+            if ignore is not None and ignore(match.start()):
+                continue
+            if match.group() == opener:
+                if depth == 0:
+                    count -= 1
+                    if count == 0:
+                        return match.start()
+                else:
+                    depth -= 1
+            else:
+                depth += 1
+        end = begin
+        size *= 2
+    return -1
+
+
+def _scan_ahead(text, pattern, closer, start, hi, count, ignore):
+    depth = 0
+    for match in pattern.finditer(text, start, hi):
+        if ignore is not None and ignore(match.start()):
+            continue
+        if match.group() == closer:
+            if depth == 0:
+                count -= 1
+                if count == 0:
+                    return match.start()
+            else:
+                depth -= 1
+        else:
+            depth += 1
+    return -1
+
+
+def _has_depth_tables(opener, closer):
+    # Single-character delimiters that fit in a byte can be scanned with
+    # `_scan_depths`. Other characters are encoded as "?", so it can't be one.
+    try:
+        return _tables[opener, closer] is not None
+    except KeyError:
+        pass
+
+    tables = None
+    if (len(opener) == len(closer) == 1 and "?" not in (opener, closer)
+            and ord(opener) < 256 and ord(closer) < 256):
+        pair = (opener + closer).encode("latin-1")
+        keep = set(pair)
+        tables = (
+            bytes(i for i in range(256) if i not in keep),
+            # Depth changes scanning forwards and backwards, as signed bytes.
+            bytes.maketrans(pair, b"\x01\xff"),
+            bytes.maketrans(pair, b"\xff\x01"),
+        )
+    _tables[opener, closer] = tables
+    return tables is not None
+
+
+def _scan_depths(text, opener, closer, begin, end, count, forward):
+    # Scan from `begin` forwards to `end`, or from `end` backwards to `begin`, for
+    # the `count`-th unmatched closer or opener respectively, like `_scan_ahead`
+    # and `_scan_back`. Instead of visiting delimiters one by one in Python, each
+    # chunk is narrowed to its delimiters with `bytes.translate`, and their
+    # depths are the prefix sums of a compact array of +1s and -1s. The pair is
+    # where the depth first reaches -count. Chunks double in size, so stopping
+    # there saves reading the rest.
+    others, ahead, back = _tables[opener, closer]
+    depth = 0
+    size = CHUNK_SIZE
+    while begin < end:
+        if forward:
+            a, b = begin, min(begin + size, end)
+        else:
+            a, b = max(end - size, begin), end
+        chunk = text[a:b].encode("latin-1", "replace")
+        if forward:
+            deltas = chunk.translate(ahead, others)
+        else:
+            deltas = chunk.translate(back, others)[::-1]
+
+        i, total = first_depth(deltas, -count - depth)
+        if i >= 0:
+            return a + _nth_delimiter(chunk, opener, closer, i, forward)
+        depth += total
+
+        if forward:
+            begin = b
+        else:
+            end = a
+        size *= 2
+    return -1
+
+
+def first_depth(deltas, depth):
+    """Find where the depth first reaches `depth`.
+
+    :param deltas:
+        The depth changes, as signed bytes.
+
+    Returns a tuple with the index of the first prefix sum of `deltas` equal to
+    `depth`, or -1, and the sum of all `deltas`.
+    """
+    if not deltas:
+        return -1, 0
+
+    if numpy is not None and len(deltas) >= NUMPY_THRESHOLD:
+        sums = numpy.frombuffer(deltas, dtype=numpy.int8).cumsum(dtype=numpy.int64)
+        hits = numpy.flatnonzero(sums == depth)
+        return (int(hits[0]) if len(hits) else -1), int(sums[-1])
+
+    sums = array("i", itertools.accumulate(array("b", deltas)))
+    try:
+        return sums.index(depth), sums[-1]
+    except ValueError:
+        return -1, sums[-1]
+
+
+def _nth_delimiter(chunk, opener, closer, n, forward):
+    # Return the offset of the `n`-th delimiter in `chunk`, counting from 0 at the
+    # start, or at the end if not `forward`. Counting is done by `bytes.count`,
+    # bisecting for the offset.
+    opener = opener.encode("latin-1")
+    closer = closer.encode("latin-1")
+    lo, hi = 0, len(chunk)
+    if forward:
+        # The smallest offset with n + 1 delimiters up to it.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if chunk.count(opener, 0, mid + 1) + chunk.count(closer, 0, mid + 1) > n:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    # The largest offset with n + 1 delimiters from it.
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if chunk.count(opener, mid) + chunk.count(closer, mid) > n:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
@@ -0,0 +1,27 @@
+"""Delimiters for particular syntaxes, on top of those for every syntax.
+
+Like `pairs`, nothing in here talks to Sublime Text. Profiles are keyed by the
+base scope of their syntax, like "source.python", and map keys to delimiters as
+the `delimiters` argument to `surround()` does.
+"""
+
+PROFILES = {
+    "source.python": {
+        "q": '"""',
+        "Q": "'''",
+        # f-strings.
+        "F": ('f"', '"'),
+    },
+    "source.rust": {
+        # Raw strings.
+        "R": ('r#"', '"#'),
+    },
+    "text.html.markdown": {
+        # Bold and italics.
+        "*": "**",
+        "_": "_",
+    },
+    "text.tex.latex": {
+        "l": ("\\left(", "\\right)"),
+    },
+}
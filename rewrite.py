@@ -0,0 +1,65 @@
+"""Changing and deleting delimiter pairs in text.
+
+Like `pairs`, nothing in here talks to Sublime Text. The commands build their
+edits with these functions and apply them to views; the command line tool in
+`cli` applies them to files.
+"""
+
+
+def change_edits(pairs, new_a, new_b):
+    """Return the edits replacing the delimiters of `pairs` with new ones.
+
+    :param pairs:
+        `(a, a_end, b, b_end)` tuples, as `pairs.find_pairs()` returns.
+
+    Returns a dictionary mapping points to `(size, text)` tuples. Each entry
+    replaces `size` characters starting at the point with `text`.
+    """
+    edits = {}
+    for a, a_end, b, b_end in pairs:
+        # Points inside the same pair resolve to it more than once.
+        edits.setdefault(a, (a_end - a, new_a))
+        edits.setdefault(b, (b_end - b, new_b))
+    return edits
+
+
+def delete_edits(pairs):
+    """Return the edits deleting the delimiters of `pairs`.
+
+    See `change_edits()`.
+    """
+    return change_edits(pairs, "", "")
+
+
+def apply_edits(chunks, edits):
+    """Apply edits to a text read a chunk at a time.
+
+    :param chunks:
+        An iterable of strings making up the text.
+    :param edits:
+        Edits as `change_edits()` returns, which mustn't overlap. A `size` of 0
+        inserts `text`.
+
+    Yields the pieces of the edited text.
+    """
+    points = sorted(edits)
+    i = 0
+    # Offset of the chunk into the text, and of the next character to copy.
+    offset = pos = 0
+    for chunk in chunks:
+        end = offset + len(chunk)
+        while i < len(points) and points[i] < end:
+            pt = points[i]
+            size, text = edits[pt]
+            if pt > pos:
+                yield chunk[max(pos - offset, 0):pt - offset]
+            yield text
+            pos = pt + size
+            i += 1
+        if pos < end:
+            yield chunk[max(pos - offset, 0):]
+        offset = end
+
+    # Insertions at the end.
+    for pt in points[i:]:
+        yield edits[pt][1]
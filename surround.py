@@ -1,6 +1,10 @@
 """Surround plugin for Sublime Six"""
 
 import logging
+import weakref
+
+from bisect import bisect_right
+from time import perf_counter
 
 import sublime
 import sublime_plugin
@@ -11,6 +15,12 @@ from sublime import Region as R
 from Six.lib.errors import AbortCommandError  # noqa: F401
 from Six.plugin import ActiveViewAwareMixin  # noqa: F401
 
+# The engine modules (index, motions, pairs and tags) and the syntax profiles are
+# imported on first use, so loading the plugin stays cheap.
+from .delimiters import DEFAULTS
+from .delimiters import Delimiters
+from .timing import Recorder
+
 # Hook ourselves up to the Six logger. Anyhing prefixed with "Six." is fine,
 # but let's establish a standard (there's a "plugin" folder in Six, hence
 # "user.plugin" here.)
@@ -19,37 +29,406 @@ _logger = logging.getLogger("Six.user.plugin.surround")
 # Limit stuff that gets exported to global scope.
 __all__ = (
     # TextCommand needs to be available to Sublime Text.
+    "_six_surround_add",
     "_six_surround_change",
     "_six_surround_delete",
+    # So do event listeners.
+    "_six_surround_index_listener",
+    # And commands for users.
+    "six_surround_convert",
+    "six_surround_profile",
     # We need this for initialization from Packages/User/sixrc.py.
     "surround",
 )
 
-BRACKETS = {
-    "'": ("'", "'"),
-    '"': ('"', '"'),
-    "(": ("(", ")"),
-    ")": ("(", ")"),
-    "[": ("[", "]"),
-    "]": ("[", "]"),
-    r"{": ("{", "}"),
-    r"}": ("{", "}"),
+# Delimiters by the key typed for them. Users can add more; see `surround()`.
+BRACKETS = Delimiters(DEFAULTS)
+
+# Key to target tags with, as in cst or dst.
+TAG_TARGET = "t"
+
+# Key to target function calls with, as in dsf, and to type a function name for
+# new delimiters, as in ysiwf.
+FUNCTION_TARGET = "f"
+
+# Keys that start typing a new tag delimiter, as in cs"<div> or ysiwtdiv>. Six
+# calls "<" "<lt>"; see KEY_NAMES.
+TAG_KEYS = ("t", "<")
+
+# Names Six gives keys that stand for a character in a tag.
+KEY_NAMES = {
+    "<lt>": "<",
+    "<space>": " ",
+    "<bar>": "|",
+    "<bslash>": "\\",
 }
 
+# Default values for the settings users can change in their preferences.
+SETTINGS = {
+    # How many characters to look at, at each side of the caret, when searching
+    # for brackets. Brackets can span lines; quotes must be in the caret line.
+    "six_surround_search_bound": 100000,
+    # How many bytes the bracket indexes of all views may use together. Indexes
+    # for the least recently used views are dropped first. Set to 0 to disable
+    # indexing.
+    "six_surround_index_budget": 16 * 1024 * 1024,
+    # Whether to ignore brackets inside strings and comments.
+    "six_surround_ignore_strings_and_comments": False,
+    # Views larger than this many characters are searched in bounded windows,
+    # see `find_pairs()`.
+    "six_surround_large_file_threshold": 1024 * 1024,
+    # In large files, how many characters to look at, at each side of the
+    # caret...
+    "six_surround_large_file_search_cap": 256 * 1024,
+    # ... and how many milliseconds to search for before giving up.
+    "six_surround_large_file_time_budget": 50,
+    # Whether to highlight the pairs cs and ds would act on while they wait for
+    # keys.
+    "six_surround_highlight_pairs": True,
+    # How many milliseconds to wait before updating the highlight. Updates
+    # requested in the meantime are coalesced.
+    "six_surround_highlight_delay": 50,
+}
+
+# How many characters to read at first when searching long lines. Each window
+# doubles the size of the previous one.
+LONG_LINE_WINDOW = 4096
+
+# How many characters to read before an opening parenthesis at first when looking
+# for the name of the function called. Longer names are read in larger windows.
+FUNCTION_NAME_WINDOW = 64
+
+# Key and scope for the regions highlighting the pairs cs and ds would act on.
+HIGHLIGHT_KEY = "six_surround_pairs"
+HIGHLIGHT_SCOPE = "region.yellowish"
+
+# Delimiters in text matching this selector are ignored if the
+# six_surround_ignore_strings_and_comments setting is on.
+IGNORED_SELECTOR = "string, comment"
+
+
+# Bracket indexes for all views, once needed; see `get_indexes()`.
+_indexes = None
+
+# Delimiters for each syntax, keyed by base scope; see `get_brackets()`. Values
+# are tuples with the version of BRACKETS they were built for and the table.
+_profiles = {}
+
+# Tries compiled for each delimiter table; see `get_targets()`. Values are tuples
+# with the version of the table they were compiled for and the tries.
+_targets = weakref.WeakKeyDictionary()
+
+# Buffer ids of the views whose indexes are being built in the background.
+_building = set()
+
+# Latency and work done, if profiling is on; see six_surround_profile.
+_recorder = Recorder()
+
+
+def get_setting(view, name):
+    return view.settings().get(name, SETTINGS[name])
+
+
+def get_brackets(view):
+    """Return the delimiters for the view's syntax.
+
+    Those are `BRACKETS`, plus the ones in the profile for the syntax, if there's
+    one in `profiles.PROFILES`. Keys in `BRACKETS` win. The table for a syntax is
+    built the first time it's needed and shared by all its views, so its pattern
+    is compiled once.
+    """
+    if view is None:
+        return BRACKETS
+
+    scope = view.scope_name(0).split(" ", 1)[0]
+    profile = _profiles.get(scope)
+    if profile is not None and profile[0] == BRACKETS.version:
+        return profile[1]
+
+    from .profiles import PROFILES
+
+    brackets = BRACKETS
+    if scope in PROFILES:
+        brackets = Delimiters()
+        for key, value in PROFILES[scope].items():
+            if isinstance(value, str):
+                brackets.add(key, value)
+            else:
+                brackets.add(key, *value)
+        for key, value in BRACKETS.items():
+            brackets.add(key, *value)
+    _profiles[scope] = BRACKETS.version, brackets
+    return brackets
+
+
+def get_delimiters(view, new):
+    """Return the opening and closing delimiters to add for the `new` key.
+
+    `new` may also be an opening tag, like "<div class='x'>", or the start of
+    a function call, like "f(".
+
+    Returns `None` if `new` is none of those.
+    """
+    from .tags import closing_tag
+
+    brackets = get_brackets(view)
+    if new in brackets:
+        return brackets[new]
+    if new.endswith("("):
+        # A function call.
+        return new, ")"
+    closer = closing_tag(new)
+    if closer is None:
+        return None
+    return new, closer
+
+
+def _read_function(text):
+    # Turn the text typed after FUNCTION_TARGET into the start of a call.
+    if text and all(c.isalnum() or c == "_" for c in text):
+        return text + "("
+    return None
+
+
+def _read_tag(text):
+    # Turn the text typed after a key in TAG_KEYS into an opening tag.
+    from .tags import closing_tag
+
+    tag = "<" + text + ">"
+    return tag if closing_tag(tag) is not None else None
+
+
+def get_targets(brackets=BRACKETS):
+    """Return the tries resolving the keys typed for delimiters.
+
+    :param brackets:
+        The delimiters to resolve keys to, as `get_brackets()` returns.
+
+    Returns a tuple with the trie for the delimiters to change or delete, as in
+    cs and ds, and the one for the delimiters to add, where tags may be typed
+    too. They're compiled again only after `brackets` changes.
+    """
+    targets = _targets.get(brackets)
+    if targets is None or targets[0] != brackets.version:
+        from .targets import TargetTrie
+
+        old = TargetTrie(KEY_NAMES)
+        new = TargetTrie(KEY_NAMES)
+        for key in brackets:
+            old.add(key, key)
+            new.add(key, key)
+        old.add(TAG_TARGET, TAG_TARGET)
+        old.add(FUNCTION_TARGET, FUNCTION_TARGET)
+        for key in TAG_KEYS:
+            new.add_reader(key, _read_tag, (">", "<cr>"))
+        new.add_reader(FUNCTION_TARGET, _read_function, ("(", "<cr>"))
+        targets = _targets[brackets] = brackets.version, old, new
+    return targets[1:]
+
+
+def read_target(state, reader):
+    """Feed a `targets.TargetReader` the keys typed for its target.
+
+    Six processes commands from their first key again as each key comes in.
+    Keys fed to `reader` on earlier calls are skipped, not walked again.
+
+    Returns `True` once the target is resolved, and `False` if more keys are
+    needed. Raises `AbortCommandError` if no target starts with the keys typed.
+    """
+    for _ in range(reader.fed):
+        state.next()
+
+    while reader.target is None:
+        if state.is_at_eof:
+            return False
+        try:
+            reader.feed(state.next())
+        except ValueError:
+            raise AbortCommandError
+    return True
+
+
+def pending_count(state):
+    """Return the count typed before the command in progress, as in 2cs(".
+
+    `execute()` gets it as `times` only once all keys are in, but highlights
+    are shown while they're being typed.
+    """
+    return getattr(state, "count", None) or 1
+
+
+def get_indexes():
+    """Return the cache holding the bracket indexes for all views.
+    """
+    global _indexes
+    if _indexes is None:
+        from .index import IndexCache
+        _indexes = IndexCache(SETTINGS["six_surround_index_budget"])
+    return _indexes
+
+
+def get_index(view, build=True):
+    """Return the bracket index for the view, if it's up to date.
+
+    :param build:
+        If `True`, start building the index with `build_index_async()` if it's
+        missing or stale.
+
+    Indexes are never built while the user waits, so this returns `None` until
+    the index is ready. Callers then fall back to scanning the text, which
+    costs less than indexing the whole buffer for a single lookup.
+
+    Returns `None` if indexing is disabled.
+    """
+    indexes = get_indexes()
+    indexes.budget = get_setting(view, "six_surround_index_budget")
+    if indexes.budget <= 0:
+        return None
+
+    change_count = view.change_count()
+    if not build:
+        return indexes.peek(view.buffer_id(), change_count)
+
+    index = indexes.get(view.buffer_id(), change_count)
+    if index is not None and index.brackets is not get_brackets(view).balanced:
+        # Delimiters were added since it was built.
+        indexes.discard(view.buffer_id())
+        index = None
+    if index is None:
+        build_index_async(view)
+        # In case it's done already.
+        index = indexes.peek(view.buffer_id(), change_count)
+    return index
+
+
+def _build_index(view):
+    from .index import BracketIndex
+
+    change_count = view.change_count()
+    text = view.substr(R(0, view.size()))
+    _recorder.count("characters read", len(text))
+    return BracketIndex(text, get_brackets(view).balanced, change_count)
+
+
+def build_index_async(view):
+    """Build the bracket index for the view on Sublime Text's async thread.
+
+    The index is handed to the main thread when it's ready, and kept only if the
+    buffer didn't change in the meantime.
+    """
+    buffer_id = view.buffer_id()
+    if buffer_id in _building:
+        return
+    _building.add(buffer_id)
+
+    def build():
+        try:
+            index = _build_index(view)
+        except Exception:
+            sublime.set_timeout(lambda: _building.discard(buffer_id))
+            raise
+        sublime.set_timeout(lambda: _install_index(view, buffer_id, index))
+
+    sublime.set_timeout_async(build)
+
+
+def _install_index(view, buffer_id, index):
+    _building.discard(buffer_id)
+    if (view.is_valid() and index.change_count == view.change_count()
+            and index.brackets is get_brackets(view).balanced):
+        get_indexes().put(buffer_id, index)
+
+
+def update_index(view, changes):
+    """Patch the bracket index for the view's buffer after its text changed.
+
+    :param changes:
+        A sequence of `(a, b, text, change_count)` tuples, in the order the
+        changes were made. The first three items are as for
+        `BracketIndex.update`, and `change_count` is the view's change count
+        before the change.
+
+    Changes are reported after the fact, so the index may have been built with
+    some of them already, and the buffer may have changed again since. Indexes
+    are only patched with the changes made right after they were built or last
+    patched, and only if those bring them up to date. Others are dropped, and
+    built again when needed.
+    """
+    if _indexes is None or not changes:
+        return
+
+    index = _indexes.peek(view.buffer_id())
+    if index is None:
+        return
+
+    # Skip the changes the index has already.
+    changes = [c for c in changes if c[3] >= index.change_count]
+    if not changes:
+        return
+
+    change_count = changes[-1][3] + 1
+    if changes[0][3] != index.change_count or change_count != view.change_count():
+        # Patching the index would take changes it doesn't have, or lines as
+        # later changes left them.
+        _indexes.discard(view.buffer_id())
+        return
+
+    def read(begin, end):
+        lines = view.line(R(begin, min(end, view.size())))
+        _recorder.count("characters read", lines.size())
+        return lines.begin(), lines.end(), view.substr(lines)
+
+    index.update([c[:3] for c in changes], read, change_count)
+
 
 # Initialization function. We need this to control initialization from other
 # modules and account for the case where Six isn't available.
-def surround(register=True):
-    """Define the Six command processor class for the Surround change plugin.
+def surround(register=True, delimiters=None):
+    """Define the Six command processor classes for the Surround plugin.
+
+    Classes are defined on the first call only, and registered once at most, so
+    calling this again, as when sixrc is reloaded, is cheap and harmless.
 
     :param register:
-        If `True`, it registers the command in addition to defining it. This
+        If `True`, it registers the commands in addition to defining them. This
         is the standard case.
+    :param delimiters:
+        A dictionary of delimiters to add to `BRACKETS`. Keys are the keys to
+        type for them, and values are `(opener, closer)` tuples, strings for
+        delimiters used at both ends, or `None` to remove the key.
 
-    Returns the defined class. User code will mostly ignore the return value,
-    but it's interesting for testing.
+    Returns a dictionary with the defined classes. User code will mostly ignore
+    the return value, but it's interesting for testing.
     """
-    from Six._init_ import editor
+    global _plugins, _registered
+
+    for key, value in (delimiters or {}).items():
+        if value is None:
+            if key in BRACKETS:
+                BRACKETS.remove(key)
+        elif isinstance(value, str):
+            BRACKETS.add(key, value)
+        else:
+            BRACKETS.add(key, *value)
+
+    if _plugins is None:
+        _plugins = _define_plugins()
+
+    if register and not _registered:
+        _register_plugins(_plugins)
+        _registered = True
+
+    return dict(_plugins)
+
+
+# Plugin classes, once defined by surround().
+_plugins = None
+
+# Whether the plugin classes are registered with Six.
+_registered = False
+
+
+def _define_plugins():
     from Six.lib.constants import Mode
     from Six.lib.errors import AbortCommandError  # noqa: F811
     from Six.lib.operators_internal import (
@@ -68,6 +447,8 @@ def surround(register=True):
             self.old = None
             # ... with this other delimiter.
             self.new = None
+            # Where we are in the keys typed for each; see read_target().
+            self._readers = None
 
         # This property is used in the context of yanking. Generally speaking,
         # plugins should return EditOperation.Other.
@@ -75,6 +456,7 @@ def surround(register=True):
         def kind(self):
             return EditOperation.Other
 
+        @_recorder.timed("CSurround.process")
         def process(self, mode, state):
             # If you uncomment the logging line and run this plugin, you will see how
             # the keys build up as you press them.
@@ -85,40 +467,48 @@ def surround(register=True):
             # a bit of a snowflake, so we need to adjust a few things below.
             super().process(mode, state)
 
-            # We need to collect two keys, one for the old delimiter; the other
-            # for the new one.
-            for i in range(2):
+            # We need to collect two targets, one for the old delimiter; the other
+            # for the new one. Either may take several keys, so we walk the tries
+            # from get_targets() as keys come in, remembering where we are.
+            if self._readers is None:
+                tries = get_targets(get_brackets(self.view))
+                self._readers = tuple(trie.reader() for trie in tries)
+
+            for i, reader in enumerate(self._readers):
+                resolved = reader.target is not None
                 # "state", aka "command state", gives us useful information about
                 # the in-flight command. And mutating its fields, we can communicate
                 # back with the Editor in charge of managing us should we need to.
-                if state.is_at_eof:
+                # The key index is incremented for us as keys are consumed while the
+                # command is processed upstream. At this point, cs have been consumed.
+                # Let's satisfy our requirements now if we can. If no target
+                # starts with the keys, read_target() lets the Editor know.
+                if not read_target(state, reader):
                     # No more keys from user available -- request more.
                     state.more_input = True
                     # Let the Editor know that we accept any key as input.
                     state.is_accepting_any_input = True
+                    if self.view is not None:
+                        # Show the user what they're about to change.
+                        highlight_pairs(self.view, self._readers[0].candidate,
+                                        pending_count(state))
                     return
 
-                # The key index is incremented for us as keys are consumed while the
-                # command is processed upstream. At this point, cs have been consumed.
-                # Let's satisfy our requirements now if we can.
-                key = state.next()
-
-                # TODO: support more delimiters.
-                if key not in BRACKETS:
-                    # Let the Editor know that something went wrong. Maybe this isn't
-                    # the best error to raise here, but it'll do for now.
-                    raise AbortCommandError
-
                 if i == 0:
-                    # First available key.
-                    self.old = key
+                    # First target.
+                    self.old = reader.target
+                    if not resolved and state.is_at_eof and self.view is not None:
+                        # While the user picks the new delimiter, find the old
+                        # ones so _six_surround_change only needs to edit.
+                        speculate_pairs(self.view, self.old, pending_count(state))
                 else:
-                    # Second available key.
-                    self.new = key
+                    # Second target.
+                    self.new = reader.target
 
             # Done! The command is ready to be executed next.
             state.more_input = False
 
+        @_recorder.timed("CSurround.execute")
         def execute(self, mode=Mode.InternalNormal, times=1, register='"'):
             if self.old == self.new:
                 # No change needed. Stop. We could complain too; not sure what the
@@ -132,7 +522,8 @@ def surround(register=True):
                 # state).
                 self.view.run_command("_six_surround_change", {
                     "old": self.old,
-                    "new": self.new
+                    "new": self.new,
+                    "count": times,
                 })
 
         def reset(self):
@@ -142,6 +533,9 @@ def surround(register=True):
             super().reset()
             self.old = None
             self.new = None
+            self._readers = None
+            if self.view is not None:
+                clear_highlight(self.view)
 
     class SurroundDeleteSixPlugin(OperatorWithoutMotion, ActiveViewAwareMixin):
         """Implement Six command processing for the Surround delete command.
@@ -150,79 +544,438 @@ def surround(register=True):
         def __init__(self, *args, **kwargs):
             super().__init__("DSurround", *args, **kwargs)
             self.old = None
+            self._reader = None
 
         @property
         def kind(self):
             return EditOperation.Other
 
+        @_recorder.timed("DSurround.process")
         def process(self, mode, state):
             super().process(mode, state)
 
-            if state.is_at_eof:
+            if self._reader is None:
+                self._reader = get_targets(get_brackets(self.view))[0].reader()
+            if not read_target(state, self._reader):
                 state.more_input = True
+                state.is_accepting_any_input = True
+                if self.view is not None:
+                    highlight_pairs(self.view, self._reader.candidate,
+                                    pending_count(state))
                 return
 
-            key = state.next()
+            self.old = self._reader.target
+
+            state.more_input = False
 
-            if key not in BRACKETS:
-                raise AbortCommandError
+        @_recorder.timed("DSurround.execute")
+        def execute(self, mode=Mode.InternalNormal, times=1, register='"'):
+            self.view.run_command("_six_surround_delete", {
+                "old": self.old,
+                "count": times,
+            })
 
-            self.old = key
+        def reset(self):
+            super().reset()
+            self.old = None
+            self._reader = None
+            if self.view is not None:
+                clear_highlight(self.view)
+
+    class SurroundAddSixPlugin(OperatorWithoutMotion, ActiveViewAwareMixin):
+        """Implement Six command processing for the Surround add command.
+
+        The motion is resolved by the plugin itself; see `motions.MOTIONS`.
+        """
+
+        def __init__(self, *args, **kwargs):
+            super().__init__("YSurround", *args, **kwargs)
+            self.motion = None
+            self.new = None
+            self._reader = None
+
+        @property
+        def kind(self):
+            return EditOperation.Other
+
+        @_recorder.timed("YSurround.process")
+        def process(self, mode, state):
+            from .motions import MOTIONS
+
+            super().process(mode, state)
+
+            # First the motion, which may take more than one key...
+            motion = ""
+            while motion not in MOTIONS:
+                if state.is_at_eof:
+                    state.more_input = True
+                    state.is_accepting_any_input = True
+                    return
+
+                motion += state.next()
+                if not any(m.startswith(motion) for m in MOTIONS):
+                    raise AbortCommandError
+
+            self.motion = motion
+
+            # ... then the delimiter.
+            if self._reader is None:
+                self._reader = get_targets(get_brackets(self.view))[1].reader()
+            if not read_target(state, self._reader):
+                state.more_input = True
+                state.is_accepting_any_input = True
+                return
+
+            self.new = self._reader.target
 
             state.more_input = False
 
+        @_recorder.timed("YSurround.execute")
         def execute(self, mode=Mode.InternalNormal, times=1, register='"'):
-            self.view.run_command("_six_surround_delete", {"old": self.old})
+            self.view.run_command("_six_surround_add", {
+                "new": self.new,
+                "motion": self.motion,
+                "count": times,
+            })
 
         def reset(self):
             super().reset()
-            self.old = None
+            self.motion = None
+            self.new = None
+            self._reader = None
 
-    if register:
-        # Register commands as plugins for the given mode and assign them the given
-        # key sequence.
-        editor.register(
-            mode=Mode.Normal, keys="<Plug>CSurround")(SurroundChangeSixPlugin)
-        editor.register(
-            mode=Mode.Normal, keys="<Plug>DSurround")(SurroundDeleteSixPlugin)
-        editor.mappings.add(Mode.Normal, "cs", "<Plug>CSurround")
-        editor.mappings.add(Mode.Normal, "ds", "<Plug>DSurround")
+    class SurroundVisualSixPlugin(OperatorWithoutMotion, ActiveViewAwareMixin):
+        """Implement Six command processing for the Surround visual add command.
+        """
+
+        def __init__(self, *args, **kwargs):
+            super().__init__("VSurround", *args, **kwargs)
+            self.new = None
+            self._reader = None
+
+        @property
+        def kind(self):
+            return EditOperation.Other
+
+        @_recorder.timed("VSurround.process")
+        def process(self, mode, state):
+            super().process(mode, state)
+
+            if self._reader is None:
+                self._reader = get_targets(get_brackets(self.view))[1].reader()
+            if not read_target(state, self._reader):
+                state.more_input = True
+                state.is_accepting_any_input = True
+                return
+
+            self.new = self._reader.target
+
+            state.more_input = False
+
+        @_recorder.timed("VSurround.execute")
+        def execute(self, mode=Mode.InternalNormal, times=1, register='"'):
+            # Surround the visual selection.
+            self.view.run_command("_six_surround_add", {
+                "new": self.new, "linewise": mode == Mode.VisualLine})
+
+        def reset(self):
+            super().reset()
+            self.new = None
+            self._reader = None
 
     return {
         "CSurround": SurroundChangeSixPlugin,
         "DSurround": SurroundDeleteSixPlugin,
+        "YSurround": SurroundAddSixPlugin,
+        "VSurround": SurroundVisualSixPlugin,
     }
 
 
+def _register_plugins(plugins):
+    from Six._init_ import editor
+    from Six.lib.constants import Mode
+
+    # Register commands as plugins for the given mode and assign them the given
+    # key sequence.
+    editor.register(mode=Mode.Normal, keys="<Plug>CSurround")(plugins["CSurround"])
+    editor.register(mode=Mode.Normal, keys="<Plug>DSurround")(plugins["DSurround"])
+    editor.register(mode=Mode.Normal, keys="<Plug>YSurround")(plugins["YSurround"])
+    editor.mappings.add(Mode.Normal, "cs", "<Plug>CSurround")
+    editor.mappings.add(Mode.Normal, "ds", "<Plug>DSurround")
+    editor.mappings.add(Mode.Normal, "ys", "<Plug>YSurround")
+    for mode in (Mode.Visual, Mode.VisualLine, Mode.VisualBlock):
+        editor.register(mode=mode, keys="<Plug>VSurround")(plugins["VSurround"])
+        editor.mappings.add(mode, "S", "<Plug>VSurround")
+
+
 class _six_surround_change(sublime_plugin.TextCommand):
     """Replaces delimiters.
 
     For example, cs'" replaces (') with (") if we are currently inside a string
-    delimited by (').
+    delimited by ('), and cst<p> replaces the tags of the element around the caret
+    with <p> and </p>.
     """
 
-    def run(self, edit, old, new):
+    @_recorder.timed("_six_surround_change.run")
+    def run(self, edit, old, new, count=1):
         # The drudgery above is necessary only to reach this point, where we know
         # exactly what Sublime Text needs to do.
-        old_a, old_b = BRACKETS[old]
-        new_a, new_b = BRACKETS[new]
-
-        a = find_in_line(self.view, old_a, forward=False)
-        if a < 0:
-            # TODO: Signal the state that it should abort.
-            # Caller can't catch this exception from the command; just stop.
-            # raise AbortCommandError
-            return
+        from .rewrite import change_edits
 
-        b = find_in_line(self.view, old_b)
-        if b < 0:
-            # TODO: Signal the state that it should abort.
-            # Caller can't catch this exception from the command; just stop.
-            # raise AbortCommandError
+        delimiters = get_delimiters(self.view, new)
+        if delimiters is None:
             return
 
-        self.view.replace(edit, R(a, a + 1), new_a)
-        self.view.replace(edit, R(b, b + 1), new_b)
+        edits = change_edits(take_pairs(self.view, old, count), *delimiters)
+
+        # TODO: Signal the state that it should abort if nothing was found.
+        # Caller can't catch this exception from the command; just stop.
+        apply_edits(self.view, edit, edits)
+
+
+class TextWindow(object):
+    """A chunk of view text fetched with a single ``view.substr()`` call.
+
+    Searching a window happens in memory, so we don't cross the plugin host API
+    boundary once per character. Points passed in and returned are view points.
+    """
+
+    __slots__ = ("begin", "text")
+
+    def __init__(self, begin, text):
+        self.begin = begin
+        self.text = text
+        _recorder.count("characters read", len(text))
+
+    @classmethod
+    def from_line(cls, view, pt, radius=None):
+        """Read the line containing `pt`.
+
+        :param radius:
+            If given, read at most this many characters at each side of `pt`
+            instead of the whole line.
+        """
+        line = view.line(pt)
+        begin, end = line.begin(), line.end()
+        if radius is not None:
+            begin = max(begin, pt - radius)
+            end = min(end, pt + radius)
+        return cls(begin, view.substr(R(begin, end)))
+
+    @classmethod
+    def from_lines(cls, view, points):
+        """Read every line from the one containing the first point to the one
+        containing the last point.
+        """
+        begin = view.line(min(points)).begin()
+        end = view.line(max(points)).end()
+        return cls(begin, view.substr(R(begin, end)))
+
+    @classmethod
+    def around(cls, view, points, radius):
+        """Read `radius` characters at each side of the span of `points`.
+        """
+        begin = max(min(points) - radius, 0)
+        end = min(max(points) + radius, view.size())
+        return cls(begin, view.substr(R(begin, end)))
+
+    @property
+    def end(self):
+        return self.begin + len(self.text)
+
+    def find_pairs(self, points, opener, closer, count=1, bound=None, ignore=None):
+        """Like `pairs.find_pairs()`, taking and returning view points.
+
+        :param ignore:
+            As for `pairs.find_pairs()`, taking offsets into the window.
+        """
+        from .pairs import find_pairs
+
+        begin = self.begin
+        pairs = find_pairs(self.text, [pt - begin for pt in points], opener, closer,
+                           count, bound, ignore)
+        return [(a + begin, a_end + begin, b + begin, b_end + begin)
+                for a, a_end, b, b_end in pairs]
+
+    def line(self, pt):
+        """Return the bounds of the line containing `pt`, clipped to the window.
+        """
+        i = pt - self.begin
+        begin = self.text.rfind("\n", 0, i) + 1
+        end = self.text.find("\n", i)
+        if end < 0:
+            end = len(self.text)
+        return self.begin + begin, self.begin + end
+
+    def find(self, character, start, stop=None):
+        """Find `character` at `start` or after it, but before `stop`.
+
+        Returns a negative integer if the character wasn't found.
+        """
+        stop = len(self.text) if stop is None else stop - self.begin
+        i = self.text.find(character, max(start - self.begin, 0), stop)
+        return i if i < 0 else self.begin + i
+
+    def rfind(self, character, start, stop=None):
+        """Find `character` at `start` or before it, but not before `stop`.
+
+        Returns a negative integer if the character wasn't found.
+        """
+        if start < self.begin:
+            return -1
+        stop = 0 if stop is None else max(stop - self.begin, 0)
+        i = self.text.rfind(character, stop, start - self.begin + 1)
+        return i if i < 0 else self.begin + i
+
+
+class ScopeRuns(object):
+    """Tells whether points are inside strings or comments.
+
+    Scopes are fetched in bulk a line at a time, as runs of text sharing a scope,
+    and kept for as long as the buffer doesn't change. Sublime Text 3 can't hand
+    us those runs, so there the scope of each point asked about is fetched
+    instead.
+    """
+
+    # Whether scope names match IGNORED_SELECTOR. There are few distinct ones.
+    _matches = {}
+
+    def __init__(self, view):
+        self.view = view
+        self.change_count = view.change_count()
+        # Maps line starts to tuples with the starts of runs in the line and
+        # whether each run is ignored.
+        self._lines = {}
+        # Maps points to whether they're ignored, in Sublime Text 3.
+        self._points = {}
+
+    def is_ignored(self, pt, window):
+        """Return `True` if `pt` is inside a string or a comment.
+
+        :param window:
+            A `TextWindow` containing `pt`, used to find line boundaries.
+        """
+        if not hasattr(self.view, "extract_tokens_with_scopes"):
+            # extract_scope() can't help: it spans the innermost meta scope,
+            # which may contain runs with other scopes, like strings in function
+            # calls. Only delimiters are asked about, so this is still cheap.
+            try:
+                return self._points[pt]
+            except KeyError:
+                is_ignored = self._points[pt] = self._is_ignored(
+                    self.view.scope_name(pt))
+                return is_ignored
+
+        begin, end = window.line(pt)
+        try:
+            starts, ignored = self._lines[begin]
+        except KeyError:
+            starts, ignored = self._lines[begin] = self._read_line(begin, end)
+        i = bisect_right(starts, pt) - 1
+        return i >= 0 and ignored[i]
+
+    def ignorer(self, window):
+        """Return a callable for `find_enclosing` taking offsets into `window`.
+        """
+        def ignore(offset):
+            return self.is_ignored(window.begin + offset, window)
+        return ignore
+
+    def _read_line(self, begin, end):
+        starts = []
+        ignored = []
+        for region, scope in self.view.extract_tokens_with_scopes(R(begin, end)):
+            starts.append(region.begin())
+            ignored.append(self._is_ignored(scope))
+        return starts, ignored
+
+    def _is_ignored(self, scope):
+        try:
+            return self._matches[scope]
+        except KeyError:
+            is_ignored = sublime.score_selector(scope, IGNORED_SELECTOR) > 0
+            return self._matches.setdefault(scope, is_ignored)
+
+
+# Scope runs for all views, keyed by buffer id.
+_scope_runs = {}
+
+
+class QuoteIndex(object):
+    """Tells which quotes pair in a view.
+
+    Quotes pair in order within each line, skipping escaped ones; see
+    `pairs.quote_pairs()`. The lines read for a search are indexed in a single
+    pass and kept for as long as the buffer doesn't change, so later searches
+    within them just bisect.
+    """
+
+    def __init__(self, view):
+        self.change_count = view.change_count()
+        # Maps quotes to `(begin, end, pairs)` tuples, where `pairs` are the
+        # offsets from `begin` of the quotes that pair in the lines up to `end`.
+        self._spans = {}
+
+    def find(self, quote, points, window):
+        """Find the pair of `quote`s for each point: the one around it, or the
+        next one in its line.
+
+        :param window:
+            A `TextWindow` containing the lines of `points`.
+
+        Returns a set of tuples with the points where the opening and closing
+        quotes begin. Points without a pair are skipped.
+        """
+        from .pairs import find_quote_pair
+        from .pairs import quote_pairs
+
+        span = self._spans.get(quote)
+        if span is None or not span[0] <= window.begin <= window.end <= span[1]:
+            span = self._spans[quote] = (window.begin, window.end,
+                                         quote_pairs(window.text, quote))
+        begin, _, pairs = span
+
+        text = window.text
+        # Offset of the window into the span.
+        shift = window.begin - begin
+        size = len(quote)
+        found = set()
+        for pt in points:
+            end = text.find("\n", pt - window.begin)
+            if end < 0:
+                end = len(text)
+            pair = find_quote_pair(pairs, pt - begin, size, end + shift)
+            if pair is not None:
+                found.add((begin + pair[0], begin + pair[1]))
+        return found
+
+
+# Quote indexes for all views, keyed by buffer id.
+_quote_indexes = {}
+
+
+def get_quote_index(view):
+    """Return the quote index for the view's buffer, if it's up to date.
+    """
+    quotes = _quote_indexes.get(view.buffer_id())
+    if quotes is None or quotes.change_count != view.change_count():
+        _recorder.count("quote index misses")
+        quotes = _quote_indexes[view.buffer_id()] = QuoteIndex(view)
+    else:
+        _recorder.count("quote index hits")
+    return quotes
+
+
+def get_scope_runs(view):
+    """Return the scope runs for the view's buffer, if it's up to date.
+    """
+    runs = _scope_runs.get(view.buffer_id())
+    if runs is None or runs.change_count != view.change_count():
+        _recorder.count("scope runs misses")
+        runs = _scope_runs[view.buffer_id()] = ScopeRuns(view)
+    else:
+        _recorder.count("scope runs hits")
+    return runs
 
 
 def find_in_line(view, character, forward=True):
@@ -237,38 +990,662 @@ def find_in_line(view, character, forward=True):
     Returns 0 or a positive integer if the character was found. The number indicates
     the character position in the view. Returns a negative integer if the character
     wasn't found.
+
+    In views larger than the `six_surround_large_file_threshold` setting, the
+    search stops after the `six_surround_large_file_search_cap` setting or the
+    `six_surround_large_file_time_budget` one, and says so in the status bar.
     """
     pt = view.sel()[0].b
-    limit = view.line(pt).end() if forward else view.line(pt).begin()
-    is_within_limits = (lambda x: x < limit) if forward else (lambda x: x >= limit)
-    increment = 1 if forward else -1
 
-    while is_within_limits(pt):
-        if view.substr(pt) == character:
+    index = get_index(view, build=False)
+    if index is not None and character in index:
+        line = view.line(pt)
+        if forward:
+            return index.find(character, pt, line.end())
+        return index.find(character, pt, line.begin(), forward=False)
+
+    if view.size() > get_setting(view, "six_surround_large_file_threshold"):
+        return _find_in_long_line(view, character, pt, forward)
+
+    window = TextWindow.from_line(view, pt)
+    if forward:
+        return window.find(character, pt)
+    return window.rfind(character, pt)
+
+
+def _find_in_long_line(view, character, pt, forward):
+    # Search outwards from the caret in windows doubling in size, so characters
+    # nearby are found fast and missing ones cost no more than the cap or the
+    # time budget, not a walk to the end of a line that may be megabytes long.
+    # Even finding the line could take that walk, so windows stop at line breaks.
+    cap, deadline = _large_file_limits(view)
+
+    if forward:
+        boundary = view.size()
+        limit = min(boundary, pt + cap)
+        # The edge of the text searched so far.
+        edge = pt
+    else:
+        boundary = 0
+        limit = max(boundary, pt - cap)
+        edge = pt if view.substr(pt) == "\n" else min(pt + 1, view.size())
+
+    size = LONG_LINE_WINDOW
+    while edge != limit:
+        if forward:
+            begin, end = edge, min(edge + size, limit)
+            window = TextWindow(begin, view.substr(R(begin, end)))
+            line_end = window.find("\n", begin)
+            found = window.find(character, begin, None if line_end < 0 else line_end)
+            edge = end
+        else:
+            begin, end = max(edge - size, limit), edge
+            window = TextWindow(begin, view.substr(R(begin, end)))
+            line_end = window.rfind("\n", end - 1)
+            found = window.rfind(character, end - 1,
+                                 None if line_end < 0 else line_end + 1)
+            edge = begin
+        if found >= 0 or line_end >= 0:
+            return found
+        if perf_counter() > deadline:
+            break
+        size *= 2
+
+    if edge != boundary:
+        _give_up(character, abs(edge - pt))
+    return -1
+
+
+def _large_file_limits(view):
+    # Return how many characters to look at, at each side of a caret, and when
+    # to stop looking, for searches in large files.
+    cap = get_setting(view, "six_surround_large_file_search_cap")
+    budget = get_setting(view, "six_surround_large_file_time_budget")
+    return cap, perf_counter() + budget / 1000
+
+
+def _give_up(delimiter, searched):
+    sublime.status_message("Surround: gave up looking for %s after %d characters"
+                           % (delimiter, searched))
+
+
+@_recorder.timed("find_pairs")
+def find_pairs(view, old, count=1):
+    """Find the `old` delimiter pair around every caret.
+
+    Quotes must be in the caret line, where they pair in order, skipping escaped
+    ones. A caret between pairs of quotes gets the next pair. Brackets and tags
+    are matched taking nesting into account and may span lines, up to the
+    `six_surround_search_bound` setting. All the text needed is read with a
+    single ``view.substr()`` call, plus one for the name of each function call.
+
+    In views larger than the `six_surround_large_file_threshold` setting, the
+    text around each caret is read in windows doubling in size instead, up to
+    the `six_surround_large_file_search_cap` setting and for as long as the
+    `six_surround_large_file_time_budget` one allows. Searches stopped by those
+    say so in the status bar.
+
+    :param old:
+        A key in the view's delimiters, see `get_brackets()`; `TAG_TARGET`; or
+        `FUNCTION_TARGET`, for the parentheses of a call and the name before
+        them, which the opening delimiter then includes.
+    :param count:
+        Find the `count`-th enclosing pair instead of the innermost one. Quotes
+        don't nest, so it's ignored for them.
+
+    Returns a sorted list of `(a, a_end, b, b_end)` tuples, where `a` and `a_end`
+    are the points where the opening delimiter begins and ends, and `b` and
+    `b_end` those for the closing one. Carets without a pair are skipped and
+    carets inside the same pair yield a single tuple.
+    """
+    points = [s.b for s in view.sel()]
+    if not points:
+        return []
+
+    if old == TAG_TARGET:
+        return _find_tag_pairs(view, points, count)
+    if old == FUNCTION_TARGET:
+        return _find_function_pairs(view, points, count)
+
+    brackets = get_brackets(view)
+    if old not in brackets:
+        # The syntax changed since the key was typed.
+        return []
+
+    old_a, old_b = brackets[old]
+    if old_a != old_b:
+        return _find_balanced_pairs(view, points, old_a, old_b, count)
+
+    if view.size() > get_setting(view, "six_surround_large_file_threshold"):
+        return _find_quotes_in_long_lines(view, points, old_a)
+
+    window = TextWindow.from_lines(view, points)
+    quotes = get_quote_index(view)
+    return sorted((a, a + len(old_a), b, b + len(old_b))
+                  for a, b in quotes.find(old_a, points, window))
+
+
+# Pairs found ahead of the cs in progress, keyed by buffer id; see
+# `speculate_pairs()`. Values are `(key, pairs)` tuples, where `key` tells what
+# was looked for and in which state the buffer and the selection were.
+_speculations = {}
+
+
+def _speculation_key(view, old, count):
+    return (old, count, view.change_count(),
+            tuple((s.a, s.b) for s in view.sel()))
+
+
+def speculate_pairs(view, old, count=1):
+    """Start finding the `old` pairs around every caret once the current
+    command returns.
+
+    `take_pairs()` returns them later, unless the buffer or the selection changed
+    in between.
+    """
+    # On the main thread, since indexes and caches aren't safe to share with
+    # the async one.
+    sublime.set_timeout(lambda: _speculate(view, old, count), 0)
+
+
+def _speculate(view, old, count):
+    key = _speculation_key(view, old, count)
+    speculation = _speculations.get(view.buffer_id())
+    if speculation is not None and speculation[0] == key:
+        return
+
+    _speculations[view.buffer_id()] = key, find_pairs(view, old, count)
+
+
+def take_pairs(view, old, count=1):
+    """Like `find_pairs()`, but use the pairs speculated for the view if they
+    are still valid.
+
+    Speculated pairs are used once at most.
+    """
+    speculation = _speculations.pop(view.buffer_id(), None)
+    if speculation is not None and speculation[0] == _speculation_key(view, old, count):
+        _recorder.count("speculation hits")
+        return speculation[1]
+
+    _recorder.count("speculation misses")
+    return find_pairs(view, old, count)
+
+
+def peek_pairs(view, old, count=1):
+    """Like `take_pairs()`, but leave the pairs for `take_pairs()` to use.
+
+    Pairs found here are kept as if speculated.
+    """
+    key = _speculation_key(view, old, count)
+    speculation = _speculations.get(view.buffer_id())
+    if speculation is not None and speculation[0] == key:
+        return speculation[1]
+
+    pairs = find_pairs(view, old, count)
+    _speculations[view.buffer_id()] = key, pairs
+    return pairs
+
+
+# Highlight updates waiting for their timeout, keyed by buffer id. Values are
+# the `(old, count)` requested last, with `None` for `old` to clear.
+_pending_highlights = {}
+
+# The pairs highlighted in each buffer, keyed by buffer id.
+_highlights = {}
+
+
+def highlight_pairs(view, old, count=1):
+    """Highlight the `old` pairs around every caret, or clear the highlight if
+    `old` is `None`.
+
+    Highlights are updated after the `six_surround_highlight_delay` setting.
+    Requests made in the meantime replace the pending one, so holding a key down
+    costs one lookup and one redraw per delay at most.
+    """
+    if old is not None and not get_setting(view, "six_surround_highlight_pairs"):
+        return
+
+    buffer_id = view.buffer_id()
+    pending = buffer_id in _pending_highlights
+    _pending_highlights[buffer_id] = old, count
+    if not pending:
+        sublime.set_timeout(lambda: _update_highlight(view),
+                            get_setting(view, "six_surround_highlight_delay"))
+
+
+@_recorder.timed("highlight_pairs")
+def _update_highlight(view):
+    request = _pending_highlights.pop(view.buffer_id(), None)
+    if request is None or not view.is_valid():
+        return
+
+    old, count = request
+    pairs = [] if old is None else peek_pairs(view, old, count)
+    if pairs == _highlights.get(view.buffer_id(), []):
+        return
+
+    if pairs:
+        _highlights[view.buffer_id()] = pairs
+        view.add_regions(HIGHLIGHT_KEY, [r for a, a_end, b, b_end in pairs
+                                         for r in (R(a, a_end), R(b, b_end))],
+                         HIGHLIGHT_SCOPE)
+    else:
+        clear_highlight(view)
+
+
+def clear_highlight(view):
+    """Clear the highlight of the pairs around the carets now.
+
+    Pending updates are dropped.
+    """
+    _pending_highlights.pop(view.buffer_id(), None)
+    if _highlights.pop(view.buffer_id(), None) is not None:
+        view.erase_regions(HIGHLIGHT_KEY)
+
+
+def _find_balanced_pairs(view, points, opener, closer, count):
+    bound = get_setting(view, "six_surround_search_bound")
+    ignore_scopes = get_setting(view, "six_surround_ignore_strings_and_comments")
+
+    # The index knows nothing about scopes.
+    index = None if ignore_scopes else get_index(view)
+    if index is not None:
+        pairs = set()
+        for pt in points:
+            pair = index.enclosing(pt, opener, count)
+            if pair is not None and pt - pair[0] <= bound and pair[1] - pt <= bound:
+                a, b = pair
+                pairs.add((a, a + len(opener), b, b + len(closer)))
+        return sorted(pairs)
+
+    if view.size() > get_setting(view, "six_surround_large_file_threshold"):
+        return _find_balanced_pairs_in_large_file(view, points, opener, closer,
+                                                  count, bound, ignore_scopes)
+
+    window = TextWindow.around(view, points, bound)
+    ignore = get_scope_runs(view).ignorer(window) if ignore_scopes else None
+    return window.find_pairs(points, opener, closer, count, bound, ignore)
+
+
+def _find_balanced_pairs_in_large_file(view, points, opener, closer, count, bound,
+                                       ignore_scopes):
+    # Search around each caret in windows doubling in size, like
+    # `_find_in_long_line()` does, so nearby pairs are found fast and missing
+    # ones cost no more than the cap or the time budget.
+    cap, deadline = _large_file_limits(view)
+    limit = min(bound, cap)
+    size = view.size()
+    runs = get_scope_runs(view) if ignore_scopes else None
+
+    pairs = set()
+    for pt in points:
+        radius = min(LONG_LINE_WINDOW, limit)
+        while True:
+            window = TextWindow.around(view, [pt], radius)
+            ignore = runs.ignorer(window) if runs is not None else None
+            found = window.find_pairs([pt], opener, closer, count, radius, ignore)
+            if found or (window.begin == 0 and window.end == size):
+                pairs.update(found)
+                break
+            if radius >= limit or perf_counter() > deadline:
+                if radius < bound:
+                    _give_up(opener, radius)
+                break
+            radius = min(radius * 2, limit)
+
+    return sorted(pairs)
+
+
+def _find_quotes_in_long_lines(view, points, quote):
+    # Quotes pair from the start of their line, so look for it backwards from
+    # each caret first. Then read ahead until the pair is found. Both searches
+    # go in windows doubling in size, like `_find_in_long_line()` does.
+    from .pairs import find_quote_pair
+    from .pairs import quote_pairs
+
+    cap, deadline = _large_file_limits(view)
+    size = view.size()
+
+    pairs = set()
+    for pt in points:
+        begin = _find_line_start(view, pt, cap, deadline)
+        if begin < 0:
+            _give_up(quote, cap)
+            continue
+
+        text = view.substr(R(begin, pt))
+        _recorder.count("characters read", len(text))
+        window = LONG_LINE_WINDOW
+        while True:
+            end = min(begin + len(text) + window, size, pt + cap)
+            chunk = view.substr(R(begin + len(text), end))
+            _recorder.count("characters read", len(chunk))
+            line_end = chunk.find("\n")
+            text += chunk if line_end < 0 else chunk[:line_end]
+
+            pair = find_quote_pair(quote_pairs(text, quote), pt - begin, len(quote))
+            if pair is not None:
+                pairs.add((begin + pair[0], begin + pair[1]))
+                break
+            if line_end >= 0 or end == size:
+                break
+            if end == pt + cap or perf_counter() > deadline:
+                _give_up(quote, end - pt)
+                break
+            window *= 2
+
+    return sorted((a, a + len(quote), b, b + len(quote)) for a, b in pairs)
+
+
+def _find_line_start(view, pt, cap, deadline):
+    # Return where the line containing `pt` begins, or -1 if it's further back
+    # than `cap` characters or the deadline passes first.
+    edge = pt
+    limit = max(pt - cap, 0)
+    size = LONG_LINE_WINDOW
+    while edge > limit:
+        begin = max(edge - size, limit)
+        text = view.substr(R(begin, edge))
+        _recorder.count("characters read", len(text))
+        i = text.rfind("\n")
+        if i >= 0:
+            return begin + i + 1
+        edge = begin
+        if perf_counter() > deadline:
             break
-        pt += increment
+        size *= 2
+    return 0 if edge == 0 else -1
+
+
+def _find_function_pairs(view, points, count):
+    from .pairs import find_call_name
+
+    pairs = set()
+    for a, a_end, b, b_end in _find_balanced_pairs(view, points, "(", ")", count):
+        # Names are read in bulk; most fit in the first window.
+        size = FUNCTION_NAME_WINDOW
+        while True:
+            begin = max(a - size, 0)
+            text = view.substr(R(begin, a))
+            _recorder.count("characters read", len(text))
+            name = begin + find_call_name(text, len(text))
+            if name > begin or begin == 0:
+                break
+            size *= 2
+        pairs.add((name, a_end, b, b_end))
+
+    return sorted(pairs)
+
+
+def _find_tag_pairs(view, points, count):
+    bound = get_setting(view, "six_surround_search_bound")
+    pairs = set()
+    for pt in points:
+        lo, hi = max(pt - bound, 0), min(pt + bound, view.size())
+        begin, scanner = get_tag_scanner(view, lo, hi)
+        pair = scanner.enclosing(pt - begin, count, lo=lo - begin, hi=hi - begin)
+        if pair is not None:
+            pairs.add(tuple(begin + x for x in pair))
+
+    return sorted(pairs)
+
+
+# Tag scanners for all views, keyed by buffer id, with the change count they are
+# valid for and where their text begins.
+_tag_scanners = {}
+
+
+def get_tag_scanner(view, begin=0, end=None):
+    """Return a tag scanner for the view's text between `begin` and `end`, and
+    the point its text begins at.
+
+    The scanner may cover more text, if it's up to date. Scanners remember the
+    tags they've parsed until the buffer changes.
+    """
+    from .tags import TagScanner
+
+    end = view.size() if end is None else end
+    change_count, start, scanner = _tag_scanners.get(view.buffer_id(),
+                                                     (None, None, None))
+    if (change_count != view.change_count() or begin < start
+            or end > start + len(scanner.text)):
+        _recorder.count("tag scanner misses")
+        text = view.substr(R(begin, end))
+        _recorder.count("characters read", len(text))
+        start, scanner = begin, TagScanner(text)
+        _tag_scanners[view.buffer_id()] = view.change_count(), start, scanner
     else:
-        return -1
+        _recorder.count("tag scanner hits")
+    return start, scanner
+
 
-    return pt
+@_recorder.timed("apply_edits")
+def apply_edits(view, edit, edits):
+    """Apply many edits to the view in a single pass.
+
+    :param edits:
+        Maps points to `(size, text)` tuples. Each entry replaces `size`
+        characters starting at the point with `text`; an empty `text` erases them
+        and a `size` of 0 inserts `text`.
+
+    Edits are applied from the end of the buffer backwards so no point needs to
+    be recomputed after a preceding edit.
+    """
+    for pt in sorted(edits, reverse=True):
+        size, text = edits[pt]
+        if not size:
+            view.insert(edit, pt, text)
+        elif text:
+            view.replace(edit, R(pt, pt + size), text)
+        else:
+            view.erase(edit, R(pt, pt + size))
 
 
 class _six_surround_delete(sublime_plugin.TextCommand):
     """Deletes delimiters.
 
-    For example, ds" deletes (") at both sides of the caret.
+    For example, ds" deletes (") at both sides of the caret, and dst deletes the
+    tags of the element around it.
     """
 
-    def run(self, edit, old):
-        old_a, old_b = BRACKETS[old]
+    @_recorder.timed("_six_surround_delete.run")
+    def run(self, edit, old, count=1):
+        from .rewrite import delete_edits
 
-        a = find_in_line(self.view, old_a, forward=False)
-        if a < 0:
+        edits = delete_edits(find_pairs(self.view, old, count))
+        apply_edits(self.view, edit, edits)
+
+
+class _six_surround_add(sublime_plugin.TextCommand):
+    """Adds delimiters.
+
+    For example, ysiw" surrounds the word under the caret with ("), and S" in
+    visual mode surrounds the selection. If `linewise` is `True`, as in visual
+    line mode, the delimiters go on lines of their own around the selected lines.
+    """
+
+    @_recorder.timed("_six_surround_add.run")
+    def run(self, edit, new, motion=None, count=1, linewise=False):
+        delimiters = get_delimiters(self.view, new)
+        if delimiters is None:
             return
 
-        b = find_in_line(self.view, old_b)
-        if b < 0:
+        new_a, new_b = delimiters
+
+        if motion is None:
+            regions = [(s.begin(), s.end()) for s in self.view.sel()]
+        else:
+            regions = find_motions(self.view, motion, count)
+
+        if linewise:
+            new_a += "\n"
+
+        edits = {}
+        for a, b in sorted(regions):
+            closer = new_b
+            if linewise:
+                # The last line of the buffer has no line break to keep.
+                if b > a and self.view.substr(b - 1) == "\n":
+                    closer = new_b + "\n"
+                else:
+                    closer = "\n" + new_b
+            # Regions may touch. Then the closer for the first one must go before
+            # the opener for the next one.
+            edits[a] = (0, edits[a][1] + new_a if a in edits else new_a)
+            edits[b] = (0, edits[b][1] + closer if b in edits else closer)
+
+        apply_edits(self.view, edit, edits)
+
+
+@_recorder.timed("find_motions")
+def find_motions(view, motion, count=1):
+    """Find the span a motion covers from every caret.
+
+    Motions don't cross lines. All caret lines are read with a single
+    ``view.substr()`` call.
+
+    Returns a sorted list of `(a, b)` tuples without duplicates.
+    """
+    from .motions import find_motion
+
+    points = [s.b for s in view.sel()]
+    if not points:
+        return []
+
+    window = TextWindow.from_lines(view, points)
+    regions = set()
+    for pt in points:
+        begin, end = window.line(pt)
+        line = window.text[begin - window.begin:end - window.begin]
+        span = find_motion(line, pt - begin, motion, count)
+        if span is not None:
+            regions.add((begin + span[0], begin + span[1]))
+
+    return sorted(regions)
+
+
+# How many characters six_surround_convert reads from the view at a time.
+CONVERT_CHUNK_SIZE = 1024 * 1024
+
+
+def read_chunks(view, region, size=CONVERT_CHUNK_SIZE):
+    """Read the text in `region` `size` characters at a time.
+    """
+    for begin in range(region.begin(), region.end(), size):
+        text = view.substr(R(begin, min(begin + size, region.end())))
+        _recorder.count("characters read", len(text))
+        yield text
+
+
+class six_surround_convert(sublime_plugin.TextCommand):
+    """Replaces every `old` delimiter pair with `new` delimiters.
+
+    For example, running it with "'" and '"' turns all single-quoted strings into
+    double-quoted ones. Pairs are replaced in the selected text, or in the whole
+    buffer if nothing is selected. Like cs, quotes pair within a line and brackets
+    pair taking nesting into account; unmatched delimiters and delimiters escaped
+    with a backslash are left alone.
+
+    The text is streamed through in chunks and every replacement is made in the
+    same edit, so it takes time proportional to the size of the text.
+    """
+
+    @_recorder.timed("six_surround_convert.run")
+    def run(self, edit, old, new):
+        from .pairs import find_all_pairs
+        from .rewrite import change_edits
+
+        brackets = get_brackets(self.view)
+        delimiters = get_delimiters(self.view, new)
+        if old not in brackets or delimiters is None:
+            return
+
+        old_a, old_b = brackets[old]
+
+        regions = [s for s in self.view.sel() if not s.empty()]
+        if not regions:
+            regions = [R(0, self.view.size())]
+
+        pairs = []
+        for region in regions:
+            begin = region.begin()
+            for a, b in find_all_pairs(read_chunks(self.view, region), old_a, old_b):
+                pairs.append((begin + a, begin + a + len(old_a),
+                              begin + b, begin + b + len(old_b)))
+
+        apply_edits(self.view, edit, change_edits(pairs, *delimiters))
+
+
+class six_surround_profile(sublime_plugin.ApplicationCommand):
+    """Profiles Surround.
+
+    :param action:
+        "start" to start recording latencies and work done, "stop" to stop, and
+        "dump" to write a summary of what's been recorded to the log.
+    """
+
+    def run(self, action="dump"):
+        if action == "start":
+            _recorder.reset()
+            indexes = get_indexes()
+            indexes.hits = indexes.misses = 0
+            _recorder.enabled = True
+        elif action == "stop":
+            _recorder.enabled = False
+        else:
+            _logger.info("Surround profile:")
+            for line in _recorder.summary():
+                _logger.info("  %s", line)
+            for name in ("tag scanner", "scope runs", "quote index", "speculation"):
+                _logger.info("  %s hit rate: %.2f", name, _recorder.hit_rate(name))
+            _logger.info("  bracket indexes: %s", get_indexes().stats)
+
+
+class _six_surround_index_listener(sublime_plugin.EventListener):
+    """Builds bracket indexes in the background for views as they're loaded or
+    activated, and drops bracket and quote indexes, scope runs, tag scanners and
+    speculated pairs for closed views.
+    """
+
+    def on_load(self, view):
+        self.index(view)
+
+    def on_activated(self, view):
+        self.index(view)
+
+    def index(self, view):
+        if view.settings().get("is_widget"):
             return
+        if get_index(view, build=False) is None and (
+                get_setting(view, "six_surround_index_budget") > 0):
+            build_index_async(view)
+
+    def on_close(self, view):
+        if _indexes is not None:
+            _indexes.discard(view.buffer_id())
+        _scope_runs.pop(view.buffer_id(), None)
+        _quote_indexes.pop(view.buffer_id(), None)
+        _tag_scanners.pop(view.buffer_id(), None)
+        _speculations.pop(view.buffer_id(), None)
+        _pending_highlights.pop(view.buffer_id(), None)
+        _highlights.pop(view.buffer_id(), None)
+
+
+if hasattr(sublime_plugin, "TextChangeListener"):
+    __all__ += ("_six_surround_index_updater", )
+
+    class _six_surround_index_updater(sublime_plugin.TextChangeListener):
+        """Keeps bracket indexes up to date as the user types.
+
+        Older Sublime Text versions don't report text changes; there, indexes are
+        just built again the next time they're needed.
+        """
+
+        @classmethod
+        def is_applicable(cls, buffer):
+            return True
 
-        self.view.erase(edit, R(b, b + 1))
-        self.view.erase(edit, R(a, a + 1))
+        def on_text_changed(self, changes):
+            update_index(self.buffer.primary(),
+                         [(c.a.pt, c.b.pt, c.str, c.a.change_count) for c in changes])
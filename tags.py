@@ -0,0 +1,180 @@
+"""HTML/XML tag pair matching for the Surround plugin.
+
+Like `pairs`, nothing in here talks to Sublime Text.
+"""
+
+import re
+
+from bisect import bisect_right
+
+# An opening, closing or self-closing tag. Attribute values may contain ">".
+TAG = re.compile(
+    r"""<(/?)([A-Za-z][\w:.-]*)(?:\s(?:"[^"]*"|'[^']*'|[^'">])*?)?\s*(/?)>""")
+
+# A tag name at the start of a new delimiter, as in "<div class='x'>".
+TAG_NAME = re.compile(r"<([A-Za-z][\w:.-]*)")
+
+# Text where tags don't count: comments, CDATA sections and the content of
+# script and style elements. Unterminated comments and sections run to the end.
+OPAQUE = re.compile(
+    r"<!--.*?(?:-->|\Z)|<!\[CDATA\[.*?(?:\]\]>|\Z)|"
+    r"<(script|style)\b[^>]*>(.*?)</\1\s*>", re.DOTALL | re.IGNORECASE)
+
+# HTML elements that never have a closing tag.
+VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr"))
+
+
+def closing_tag(opener):
+    """Return the closing tag for an opening tag like "<div class='x'>".
+
+    Returns `None` if `opener` isn't an opening tag.
+    """
+    match = TAG_NAME.match(opener)
+    if match is None or not opener.endswith(">"):
+        return None
+    return "</%s>" % match.group(1)
+
+
+class TagScanner(object):
+    """Finds enclosing tag pairs in a text.
+
+    Tags are parsed lazily, walking outwards from the offset being searched, and
+    only until the enclosing element is found. Parsed tags are remembered, so
+    later lookups in the same text don't parse them again. Tag names are
+    matched ignoring case, as in HTML.
+
+    Tags inside comments, CDATA sections, and script and style elements are
+    ignored. Those are found lazily too, only as far as the offsets asked about.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        # Maps offsets of "<" to tuples with the end of the tag, its name and
+        # its kind (see `tag_at`), or to `None` if there's no tag there.
+        self._tags = {}
+        # Starts and ends of the spans where tags are ignored found so far, and
+        # where to look for more.
+        self._opaque = [], []
+        self._opaque_end = 0
+
+    def tag_at(self, start):
+        """Parse the tag starting at `start`.
+
+        Returns a tuple with the end of the tag, its name in lowercase and its
+        kind: 1 for opening tags, -1 for closing tags and 0 for tags that don't
+        need closing. Returns `None` if there's no tag at `start`, or if it's
+        where tags are ignored.
+        """
+        try:
+            return self._tags[start]
+        except KeyError:
+            pass
+
+        tag = None
+        match = TAG.match(self.text, start)
+        if match is not None and not self._is_opaque(start):
+            closing, name, self_closing = match.groups()
+            name = name.lower()
+            if closing:
+                kind = -1
+            elif self_closing or name in VOID_ELEMENTS:
+                kind = 0
+            else:
+                kind = 1
+            tag = match.end(), name, kind
+        self._tags[start] = tag
+        return tag
+
+    def _is_opaque(self, offset):
+        starts, ends = self._opaque
+        while self._opaque_end <= offset:
+            match = OPAQUE.search(self.text, self._opaque_end)
+            if match is None:
+                self._opaque_end = len(self.text) + 1
+                break
+            # Script and style tags themselves count; their content doesn't.
+            begin, end = match.span(2) if match.group(1) else match.span()
+            starts.append(begin)
+            ends.append(end)
+            self._opaque_end = match.end()
+        i = bisect_right(starts, offset) - 1
+        return i >= 0 and offset < ends[i]
+
+    def _tags_before(self, end, lo):
+        start = self.text.rfind("<", lo, end)
+        while start >= 0:
+            tag = self.tag_at(start)
+            if tag is not None:
+                yield start, tag
+            start = self.text.rfind("<", lo, start)
+
+    def _tags_after(self, start, hi):
+        start = self.text.find("<", start, hi)
+        while start >= 0:
+            tag = self.tag_at(start)
+            if tag is not None and tag[0] <= hi:
+                yield start, tag
+            start = self.text.find("<", start + 1, hi)
+
+    def enclosing(self, offset, count=1, lo=0, hi=None):
+        """Find the element enclosing `offset`.
+
+        A caret inside a tag is inside the element that tag belongs to.
+
+        :param count:
+            Find the `count`-th enclosing element instead of the innermost one.
+        :param lo:
+            Don't look further back than this offset.
+        :param hi:
+            Don't look further ahead than this offset.
+
+        Returns a tuple with the offsets where the opening tag begins and ends,
+        and where the closing tag begins and ends, or `None` if there's no such
+        element.
+        """
+        hi = len(self.text) if hi is None else hi
+
+        # If the caret is inside a tag, move it to the element's content.
+        start = self.text.rfind("<", lo, offset + 1)
+        if start >= 0:
+            tag = self.tag_at(start)
+            if tag is not None and offset < tag[0]:
+                offset = start if tag[2] < 0 else tag[0]
+
+        # Names of elements closed between the caret and the tag being looked at.
+        closed = []
+        # Closers for outer elements come after those for inner ones.
+        after = offset
+        for start, (end, name, kind) in self._tags_before(offset, lo):
+            if kind < 0:
+                closed.append(name)
+            elif kind > 0:
+                if name in closed:
+                    # Its closer is the last one seen with that name. Closers
+                    # seen after it have no opener.
+                    del closed[len(closed) - 1 - closed[::-1].index(name):]
+                    continue
+                closer = self._find_closer(name, max(after, end), hi)
+                if closer is None:
+                    # An unclosed element can't enclose anything.
+                    continue
+                after = closer[1]
+                count -= 1
+                if count == 0:
+                    return (start, end) + closer
+        return None
+
+    def _find_closer(self, name, start, hi):
+        depth = 0
+        for begin, (end, other, kind) in self._tags_after(start, hi):
+            if other != name:
+                continue
+            if kind > 0:
+                depth += 1
+            elif kind < 0:
+                if depth == 0:
+                    return begin, end
+                depth -= 1
+        return None
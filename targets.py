@@ -0,0 +1,139 @@
+"""Resolving the keys typed for the delimiters of cs, ds, ys and S.
+
+Like `pairs`, nothing in here talks to Sublime Text. The keys standing for every
+target are compiled into a trie once, which `TargetReader`s then walk a key at a
+time as the user types them. Keys may be longer than a character, as in
+delimiters users add, and some targets go on with text, as new tags do.
+"""
+
+# The key picking the target a prefix stands for when longer keys start with it.
+ENTER = "<cr>"
+
+
+class _Node(object):
+
+    __slots__ = ("children", "target", "read", "end")
+
+    def __init__(self):
+        # Maps the next character to the node for it.
+        self.children = {}
+        # What the keys up to here stand for, if anything.
+        self.target = None
+        # If set, a function turning the text typed after the keys up to here
+        # into a target, and the keys ending that text.
+        self.read = None
+        self.end = ()
+
+
+class TargetTrie(object):
+    """Maps the keys typed for targets to the targets.
+
+    :param names:
+        A dictionary mapping the names of keys, like "<space>", to the
+        characters they stand for.
+    """
+
+    def __init__(self, names=None):
+        self.root = _Node()
+        self.names = names or {}
+
+    def add(self, keys, target):
+        """Make the characters in `keys` stand for `target`.
+        """
+        self._node(keys).target = target
+
+    def add_reader(self, keys, read, end):
+        """Make the characters in `keys` start text typed for a target.
+
+        :param read:
+            A function taking the text typed up to any of the keys in `end` and
+            returning the target, or `None` if the text is invalid.
+
+        Readers win over targets for the same keys.
+        """
+        node = self._node(keys)
+        node.read = read
+        node.end = end
+
+    def _node(self, keys):
+        if not keys:
+            raise ValueError("targets need keys")
+        node = self.root
+        for key in keys:
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = _Node()
+            node = child
+        return node
+
+    def reader(self):
+        return TargetReader(self)
+
+
+class TargetReader(object):
+    """Walks a `TargetTrie` a key at a time.
+
+    Readers stop at a target as soon as no longer keys start with those fed, and
+    wait for more keys otherwise. `ENTER` picks the target the keys fed so far
+    stand for.
+
+    Attributes:
+
+    - `fed`: how many keys the reader was fed.
+    - `target`: the target the keys resolved to, or `None` until they do.
+    """
+
+    __slots__ = ("_trie", "_node", "_text", "fed", "target")
+
+    def __init__(self, trie):
+        self._trie = trie
+        self._node = trie.root
+        # Text typed after a reader's keys, or `None` if not reading any.
+        self._text = None
+        self.fed = 0
+        self.target = None
+
+    @property
+    def candidate(self):
+        """The target the keys fed so far stand for, even if longer keys start
+        with them, or `None`.
+        """
+        if self.target is not None or self._text is not None:
+            return self.target
+        return self._node.target
+
+    def feed(self, key):
+        """Walk one key further.
+
+        Returns `True` once the keys fed resolve to a target, and `False` if more
+        keys are needed. Raises `ValueError` if no target starts with the keys
+        fed.
+        """
+        if self.target is not None:
+            raise ValueError("the target is resolved already")
+        self.fed += 1
+        node = self._node
+
+        if self._text is not None:
+            if key not in node.end:
+                self._text += self._trie.names.get(key, key)
+                return False
+            self.target = node.read(self._text)
+            if self.target is None:
+                raise ValueError("invalid text for target: %r" % self._text)
+            return True
+
+        if key == ENTER and node.target is not None:
+            self.target = node.target
+            return True
+
+        node = node.children.get(self._trie.names.get(key, key))
+        if node is None:
+            raise ValueError("no target for key: %r" % key)
+        self._node = node
+        if node.read is not None:
+            self._text = ""
+        elif node.target is not None and not node.children:
+            self.target = node.target
+            return True
+        return False
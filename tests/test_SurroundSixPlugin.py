@@ -10,7 +10,9 @@ from Six.lib.constants import Mode
 from Six.lib.errors import AbortCommandError
 from Six.lib.yank_registers import EditOperation
 
+from User.six.surround import BRACKETS
 from User.six.surround import surround
+from User.six.targets import TargetReader
 from User.six.tests import ViewTest
 
 
@@ -23,6 +25,23 @@ class TestSurroundSixPluginBase(unittest.TestCase):
         self.state = CommandState()
 
 
+class Test_surround(unittest.TestCase):
+
+    def testDefinesClassesOnce(self):
+        self.assertIs(surround(register=False)["CSurround"],
+                      surround(register=False)["CSurround"])
+
+    def testRegistersOnce(self):
+        with mock.patch("User.six.surround._registered", False), \
+                mock.patch("Six._init_.editor") as editor:
+            surround()
+            surround()
+
+        # Three normal mode commands, and the visual one for three modes.
+        self.assertEquals(editor.register.call_count, 6)
+        self.assertEquals(editor.mappings.add.call_count, 6)
+
+
 class TestSurroundChangeSixPluginBase(TestSurroundSixPluginBase):
 
     def setUp(self):
@@ -120,6 +139,202 @@ class TestSurroundChangeSixPlugin_process(TestSurroundChangeSixPluginBase):
 
         self.assertEquals("'", self.command.new)
 
+    def testSpeculatesPairsWhileWaitingForSecondKey(self):
+        self.state.append('"')
+
+        with mock.patch.object(type(self.command), "view",
+                               new_callable=mock.PropertyMock) as view, \
+                mock.patch("User.six.surround.speculate_pairs") as speculate_pairs:
+            self.command.process(Mode.Normal, self.state)
+
+        speculate_pairs.assert_called_once_with(view.return_value, '"', 1)
+
+    def testSpeculatesPairsForCount(self):
+        self.state.count = 3
+        self.state.append('"')
+
+        with mock.patch.object(type(self.command), "view",
+                               new_callable=mock.PropertyMock) as view, \
+                mock.patch("User.six.surround.speculate_pairs") as speculate_pairs:
+            self.command.process(Mode.Normal, self.state)
+
+        speculate_pairs.assert_called_once_with(view.return_value, '"', 3)
+
+    def testHighlightsPairsForCount(self):
+        self.state.count = 2
+        self.state.append('"')
+
+        with mock.patch.object(type(self.command), "view",
+                               new_callable=mock.PropertyMock) as view, \
+                mock.patch("User.six.surround.highlight_pairs") as highlight_pairs:
+            self.command.process(Mode.Normal, self.state)
+
+        highlight_pairs.assert_called_once_with(view.return_value, '"', 2)
+
+
+class TestSurroundChangeSixPlugin_processTags(TestSurroundChangeSixPluginBase):
+
+    def testAcceptsTagTarget(self):
+        self.state.append("t")
+        self.state.append('"')
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertEquals("t", self.command.old)
+        self.assertEquals('"', self.command.new)
+
+    def testRequestsMoreInputUntilTagIsClosed(self):
+        for key in ("'", "<lt>", "d", "i", "v"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+        self.assertIsNone(self.command.new)
+
+    def testSetsTag(self):
+        for key in ("'", "t", "p", "<space>", "i", "d", "=", "x", ">"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertFalse(self.state.more_input)
+        self.assertEquals("<p id=x>", self.command.new)
+
+    def testRaisesErrorIfInvalidTag(self):
+        for key in ("'", "<", ">"):
+            self.state.append(key)
+
+        def fail():
+            self.command.process(Mode.Normal, self.state)
+
+        self.assertRaises(AbortCommandError, fail)
+
+
+class TestSurroundChangeSixPlugin_processFunctions(TestSurroundChangeSixPluginBase):
+
+    def testAcceptsFunctionTarget(self):
+        for key in ("f", "b"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertEquals("f", self.command.old)
+        self.assertEquals("b", self.command.new)
+
+    def testSetsFunctionName(self):
+        for key in ("f", "f", "g", "_", "1", "<cr>"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertFalse(self.state.more_input)
+        self.assertEquals("g_1(", self.command.new)
+
+    def testRequestsMoreInputUntilFunctionNameEnds(self):
+        for key in ("f", "f", "g"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+        self.assertIsNone(self.command.new)
+
+    def testRaisesErrorIfInvalidFunctionName(self):
+        for key in ("f", "f", "<space>", "<cr>"):
+            self.state.append(key)
+
+        def fail():
+            self.command.process(Mode.Normal, self.state)
+
+        self.assertRaises(AbortCommandError, fail)
+
+
+class TestSurroundChangeSixPlugin_processDelimiters(TestSurroundChangeSixPluginBase):
+
+    def testAcceptsAliases(self):
+        self.state.append("b")
+        self.state.append("r")
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertEquals("b", self.command.old)
+        self.assertEquals("r", self.command.new)
+
+    def testAcceptsDelimitersAddedByUsers(self):
+        surround(register=False, delimiters={"`": "`", "%": ("{%", "%}")})
+        self.addCleanup(BRACKETS.remove, "`")
+        self.addCleanup(BRACKETS.remove, "%")
+        self.state.append("`")
+        self.state.append("%")
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertEquals(BRACKETS[self.command.old], ("`", "`"))
+        self.assertEquals(BRACKETS[self.command.new], ("{%", "%}"))
+
+    def testRejectsDelimitersRemovedByUsers(self):
+        surround(register=False, delimiters={"r": None, "unknown": None})
+        self.addCleanup(BRACKETS.add, "r", "[", "]")
+        self.state.append("r")
+
+        def fail():
+            self.command.process(Mode.Normal, self.state)
+
+        self.assertNotIn("r", BRACKETS)
+        self.assertRaises(AbortCommandError, fail)
+
+    def testAcceptsKeysLongerThanAKey(self):
+        surround(register=False, delimiters={"cc": ("/*", "*/")})
+        self.addCleanup(BRACKETS.remove, "cc")
+        for key in ("c", "c", "b"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertEquals("cc", self.command.old)
+        self.assertEquals("b", self.command.new)
+
+    def testRequestsMoreInputWhileKeysAreAmbiguous(self):
+        surround(register=False, delimiters={"q": "'", "qq": '"'})
+        self.addCleanup(BRACKETS.remove, "q")
+        self.addCleanup(BRACKETS.remove, "qq")
+        self.state.append("q")
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+        self.assertIsNone(self.command.old)
+
+    def testEnterPicksAmbiguousKeys(self):
+        surround(register=False, delimiters={"q": "'", "qq": '"'})
+        self.addCleanup(BRACKETS.remove, "q")
+        self.addCleanup(BRACKETS.remove, "qq")
+        for key in ("q", "<cr>", "b"):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertEquals("q", self.command.old)
+        self.assertEquals("b", self.command.new)
+
+    def testResumesWhereItLeftOffWhenProcessedAgain(self):
+        for key in ("b", "t", "p"):
+            self.state.append(key)
+        self.command.process(Mode.Normal, self.state)
+
+        # Six processes the keys from the start when more come in.
+        state = CommandState()
+        for key in ("b", "t", "p", ">"):
+            state.append(key)
+        with mock.patch.object(TargetReader, "feed", autospec=True,
+                               side_effect=TargetReader.feed) as feed:
+            self.command.process(Mode.Normal, state)
+
+        feed.assert_called_once_with(mock.ANY, ">")
+        self.assertFalse(state.more_input)
+        self.assertEquals("<p>", self.command.new)
+
 
 class TestSurroundChangeSixPlugin_reset(TestSurroundChangeSixPluginBase):
 
@@ -151,6 +366,17 @@ class TestSurroundSixPluginChange_execute(TestSurroundChangeSixPluginBase, ViewT
         self.assertEquals("[", self.view.substr(4))
         self.assertEquals("]", self.view.substr(8))
 
+    def testCanExecuteWithCount(self):
+        self.view.run_command("append", { "characters": "a(b(c)d)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(4))
+
+        self.command.old = "("
+        self.command.new = "{"
+        self.command.execute(times=2)
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "a{b(c)d}")
+
     def testDoesNotExecuteForIdenticalBracket(self):
         self.view.run_command("append", { "characters": "aaa (bbb) ccc" })
         self.view.sel().clear()
@@ -265,6 +491,44 @@ class TestSurroundSixPluginDelete_process(TestSurroundDeleteSixPluginBase):
 
         self.assertEquals('"', self.command.old)
 
+    def testAcceptsTagTarget(self):
+        self.state.append("t")
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertFalse(self.state.more_input)
+        self.assertEquals("t", self.command.old)
+
+    def testAcceptsKeysLongerThanAKey(self):
+        surround(register=False, delimiters={"cc": ("/*", "*/")})
+        self.addCleanup(BRACKETS.remove, "cc")
+        self.state.append("c")
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+
+        # Six processes the keys from the start when more come in.
+        state = CommandState()
+        state.append("c")
+        state.append("c")
+        self.command.process(Mode.Normal, state)
+
+        self.assertFalse(state.more_input)
+        self.assertEquals("cc", self.command.old)
+
+    def testHighlightsPairsForCount(self):
+        surround(register=False, delimiters={"c": "|", "cc": ("/*", "*/")})
+        self.addCleanup(BRACKETS.remove, "c")
+        self.addCleanup(BRACKETS.remove, "cc")
+        self.state.count = 2
+        self.state.append("c")
+
+        with mock.patch.object(type(self.command), "view",
+                               new_callable=mock.PropertyMock) as view, \
+                mock.patch("User.six.surround.highlight_pairs") as highlight_pairs:
+            self.command.process(Mode.Normal, self.state)
+
+        highlight_pairs.assert_called_once_with(view.return_value, "c", 2)
+
 
 class TestSurroundSixPluginDelete_execute(TestSurroundDeleteSixPluginBase, ViewTest):
 
@@ -281,3 +545,143 @@ class TestSurroundSixPluginDelete_execute(TestSurroundDeleteSixPluginBase, ViewT
 
         self.assertEquals("b", self.view.substr(4))
         self.assertEquals(" ", self.view.substr(7))
+
+    def testCanExecuteWithCount(self):
+        self.view.run_command("append", { "characters": "a[b[c]d]" })
+        self.view.sel().clear()
+        self.view.sel().add(R(4))
+
+        self.command.old = "["
+        self.command.execute(times=2)
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "ab[c]d")
+
+
+class TestSurroundAddSixPluginBase(TestSurroundSixPluginBase):
+
+    def setUp(self):
+        self.plugin_name = "YSurround"
+        super().setUp()
+
+
+class TestSurroundSixPluginAdd_process(TestSurroundAddSixPluginBase):
+
+    def testRequestsMoreInputIfNoInputAvailable(self):
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+
+    def testRequestsMoreInputIfMotionIncomplete(self):
+        self.state.append("i")
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+        self.assertIsNone(self.command.motion)
+
+    def testRequestsMoreInputIfNoDelimiterAvailable(self):
+        self.state.append("i")
+        self.state.append("w")
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertTrue(self.state.more_input)
+        self.assertEquals(self.command.motion, "iw")
+
+    def testSetsFunctionName(self):
+        for key in ("i", "w", "f", "g", "("):
+            self.state.append(key)
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertFalse(self.state.more_input)
+        self.assertEquals(self.command.new, "g(")
+
+    def testRaisesErrorIfUnknownMotion(self):
+        self.state.append("x")
+
+        def fail():
+            self.command.process(Mode.Normal, self.state)
+
+        self.assertRaises(AbortCommandError, fail)
+
+    def testRaisesErrorIfUnknownDelimiter(self):
+        self.state.append("w")
+        self.state.append("?")
+
+        def fail():
+            self.command.process(Mode.Normal, self.state)
+
+        self.assertRaises(AbortCommandError, fail)
+
+    def testSetsMotionAndDelimiter(self):
+        self.state.append("a")
+        self.state.append("W")
+        self.state.append("(")
+
+        self.command.process(Mode.Normal, self.state)
+
+        self.assertFalse(self.state.more_input)
+        self.assertEquals(self.command.motion, "aW")
+        self.assertEquals(self.command.new, "(")
+
+
+class TestSurroundSixPluginAdd_execute(TestSurroundAddSixPluginBase, ViewTest):
+
+    def testCanExecute(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.command.motion = "iw"
+        self.command.new = "["
+        self.command.execute()
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa [bbb] ccc")
+
+
+class TestSurroundVisualSixPluginBase(TestSurroundSixPluginBase):
+
+    def setUp(self):
+        self.plugin_name = "VSurround"
+        super().setUp()
+
+
+class TestSurroundSixPluginVisual_process(TestSurroundVisualSixPluginBase):
+
+    def testRequestsMoreInputIfNoInputAvailable(self):
+        self.command.process(Mode.Visual, self.state)
+
+        self.assertTrue(self.state.more_input)
+
+    def testSetsDelimiter(self):
+        self.state.append('"')
+
+        self.command.process(Mode.Visual, self.state)
+
+        self.assertFalse(self.state.more_input)
+        self.assertEquals(self.command.new, '"')
+
+
+class TestSurroundSixPluginVisual_execute(TestSurroundVisualSixPluginBase, ViewTest):
+
+    def testCanExecute(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(4, 7))
+
+        self.command.new = "{"
+        self.command.execute()
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa {bbb} ccc")
+
+    def testPutsDelimitersOnLinesOfTheirOwnInVisualLineMode(self):
+        self.view.run_command("append", { "characters": "foo\nbar\nbaz" })
+        self.view.sel().clear()
+        self.view.sel().add(R(0, 8))
+
+        self.command.new = "("
+        self.command.execute(mode=Mode.VisualLine)
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "(\nfoo\nbar\n)\nbaz")
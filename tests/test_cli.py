@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from User.six import cli
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        return path
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name), encoding="utf-8",
+                  newline="") as f:
+            return f.read()
+
+    def run_cli(self, *args):
+        return cli.main(["--jobs", "1"] + list(args))
+
+
+class Test_rewrite_file(CliTest):
+
+    def testChangesEveryPair(self):
+        path = self.write("a.py", "x = ['a', ('b', 'c')]\r\ny = 'é'\n")
+
+        self.assertEquals(cli.rewrite_file(path, ("'", "'"), ('"', '"')), (32, 4))
+
+        self.assertEquals(self.read("a.py"), 'x = ["a", ("b", "c")]\r\ny = "é"\n')
+
+    def testDeletesEveryPair(self):
+        path = self.write("a.txt", "f(a(b)) )")
+
+        self.assertEquals(cli.rewrite_file(path, ("(", ")"), None), (9, 2))
+
+        self.assertEquals(self.read("a.txt"), "fab )")
+
+    def testDecodesCharactersStraddlingChunks(self):
+        path = self.write("a.txt", "'é' " * 1000)
+
+        cli.CHUNK_SIZE, chunk_size = 3, cli.CHUNK_SIZE
+        try:
+            cli.rewrite_file(path, ("'", "'"), ("[", "]"))
+        finally:
+            cli.CHUNK_SIZE = chunk_size
+
+        self.assertEquals(self.read("a.txt"), "[é] " * 1000)
+
+    def testLeavesFilesWithoutPairsAlone(self):
+        path = self.write("a.txt", "abc")
+        mtime = os.stat(path).st_mtime_ns
+
+        self.assertEquals(cli.rewrite_file(path, ("(", ")"), ("[", "]")), (3, 0))
+
+        self.assertEquals(os.stat(path).st_mtime_ns, mtime)
+
+    def testCanCountPairsOnly(self):
+        path = self.write("a.txt", "(a)")
+
+        self.assertEquals(cli.rewrite_file(path, ("(", ")"), None, dry_run=True),
+                          (3, 1))
+
+        self.assertEquals(self.read("a.txt"), "(a)")
+
+    def testCanReadEmptyFiles(self):
+        path = self.write("a.txt", "")
+
+        self.assertEquals(cli.rewrite_file(path, ("(", ")"), None), (0, 0))
+
+    def testLeavesNoTemporaryFilesBehind(self):
+        path = self.write("a.txt", "(a)")
+
+        cli.rewrite_file(path, ("(", ")"), ("<p>", "</p>"))
+
+        self.assertEquals(os.listdir(self.directory), ["a.txt"])
+        self.assertEquals(self.read("a.txt"), "<p>a</p>")
+
+
+class Test_main(CliTest):
+
+    def testChangesFilesMatchingPatterns(self):
+        self.write("a.py", "f('a')")
+        self.write("sub/b.py", "g('b')")
+        self.write("c.txt", "h('c')")
+
+        status = self.run_cli("change", "'", "b",
+                              os.path.join(self.directory, "**", "*.py"))
+
+        self.assertEquals(status, 0)
+        self.assertEquals(self.read("a.py"), "f((a))")
+        self.assertEquals(self.read("sub/b.py"), "g((b))")
+        self.assertEquals(self.read("c.txt"), "h('c')")
+
+    def testDeletesPairs(self):
+        self.write("a.txt", "[a] [b]")
+
+        self.run_cli("delete", "r", os.path.join(self.directory, "a.txt"))
+
+        self.assertEquals(self.read("a.txt"), "a b")
+
+    def testReportsUndecodableFiles(self):
+        path = self.write("a.txt", "")
+        with open(path, "wb") as f:
+            f.write(b"'\xff'")
+
+        self.assertEquals(self.run_cli("change", "'", '"', path), 1)
+
+    def testRejectsUnknownDelimiters(self):
+        with self.assertRaises(SystemExit):
+            self.run_cli("change", "?", '"', self.directory)
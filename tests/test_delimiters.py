@@ -0,0 +1,46 @@
+import unittest
+
+from User.six.delimiters import Delimiters
+from User.six.delimiters import compile_delimiters
+
+
+class Test_compile_delimiters(unittest.TestCase):
+
+    def testMatchesLongestDelimiterFirst(self):
+        pattern = compile_delimiters(["{", "{%", "%}"])
+
+        self.assertEquals([m.group() for m in pattern.finditer("{{% x %}")],
+                          ["{", "{%", "%}"])
+
+    def testCompilesOnce(self):
+        self.assertIs(compile_delimiters(["(", ")"]), compile_delimiters([")", "("]))
+
+
+class Test_Delimiters(unittest.TestCase):
+
+    def testCanAddDelimiters(self):
+        delimiters = Delimiters({"(": ("(", ")")})
+        delimiters.add("`", "`")
+        delimiters.add("c", "/*", "*/")
+
+        self.assertEquals(delimiters["`"], ("`", "`"))
+        self.assertEquals(delimiters["c"], ("/*", "*/"))
+        self.assertEquals(delimiters.balanced, [("(", ")"), ("/*", "*/")])
+
+    def testCanRemoveDelimiters(self):
+        delimiters = Delimiters({"(": ("(", ")"), "b": ("(", ")")})
+        delimiters.remove("b")
+
+        self.assertNotIn("b", delimiters)
+        self.assertEquals(delimiters.balanced, [("(", ")")])
+
+    def testRecompilesAfterChanges(self):
+        delimiters = Delimiters({"(": ("(", ")")})
+        balanced = delimiters.balanced
+        delimiters.add("c", "/*", "*/")
+
+        self.assertIsNot(delimiters.balanced, balanced)
+        self.assertEquals(delimiters.balanced, [("(", ")"), ("/*", "*/")])
+
+    def testRejectsEmptyDelimiters(self):
+        self.assertRaises(ValueError, Delimiters().add, "x", "")
@@ -0,0 +1,158 @@
+import unittest
+from unittest import mock
+
+from User.six.index import BracketIndex
+from User.six.index import IndexCache
+
+BRACKETS = [("(", ")"), ("[", "]"), ("{", "}")]
+
+
+class Test_BracketIndex(unittest.TestCase):
+
+    def testCanFindEnclosingPair(self):
+        index = BracketIndex("aaa (bbb) ccc", BRACKETS)
+
+        self.assertEquals(index.enclosing(6, "("), (4, 8))
+        self.assertIsNone(index.enclosing(2, "("))
+        self.assertIsNone(index.enclosing(6, "["))
+
+    def testSkipsNestedPairs(self):
+        index = BracketIndex("f(a(b)c)", BRACKETS)
+
+        self.assertEquals(index.enclosing(6, "("), (1, 7))
+        self.assertEquals(index.enclosing(4, "("), (3, 5))
+        self.assertEquals(index.enclosing(3, "("), (3, 5))
+        self.assertEquals(index.enclosing(5, "("), (3, 5))
+
+    def testCanFindOuterPair(self):
+        index = BracketIndex("a(b(c(d)))", BRACKETS)
+
+        self.assertEquals(index.enclosing(6, "(", count=2), (3, 8))
+        self.assertEquals(index.enclosing(6, "(", count=3), (1, 9))
+        self.assertIsNone(index.enclosing(6, "(", count=4))
+
+    def testSkipsUnbalancedBrackets(self):
+        index = BracketIndex("(a ( b) ) c)", BRACKETS)
+
+        self.assertEquals(index.enclosing(10, "("), None)
+        self.assertEquals(index.enclosing(8, "("), (0, 8))
+
+    def testKindsAreIndependent(self):
+        index = BracketIndex("([a)]", BRACKETS)
+
+        self.assertEquals(index.enclosing(2, "("), (0, 3))
+        self.assertEquals(index.enclosing(2, "["), (1, 4))
+
+    def testCanFind(self):
+        index = BracketIndex("(a) (b)", BRACKETS)
+
+        self.assertEquals(index.find("(", 1, 7), 4)
+        self.assertEquals(index.find(")", 1, 7), 2)
+        self.assertEquals(index.find("(", 5, 0, forward=False), 4)
+        self.assertEquals(index.find(")", 5, 0, forward=False), 2)
+        self.assertTrue(index.find("(", 5, 7) < 0)
+
+    def testReportsSize(self):
+        index = BracketIndex("(a) [b]", BRACKETS)
+
+        self.assertEquals(len(index), 4)
+        self.assertTrue(index.nbytes > 0)
+
+    def testTakesFewBytesPerBracket(self):
+        small = BracketIndex("(a)", BRACKETS)
+        large = BracketIndex("(a)" * 10000, BRACKETS)
+
+        # Positions, partners and parents take 8 bytes each; openers one.
+        self.assertTrue(large.nbytes - small.nbytes < 30 * len(large))
+
+    def testCanListBrackets(self):
+        index = BracketIndex("a(b(c) d", BRACKETS)
+
+        brackets = index.entries("(")
+
+        self.assertEquals([b.position for b in brackets], [1, 3, 5])
+        self.assertEquals([b.is_opener for b in brackets], [True, True, False])
+        self.assertEquals([b.partner for b in brackets], [None, 5, 3])
+        self.assertEquals(index.entries("["), [])
+
+    def testCanUpdate(self):
+        old = "f(a) g(b)"
+        new = "f(a(x) g(b)"
+        index = BracketIndex(old, BRACKETS, change_count=0)
+
+        def read(begin, end):
+            return 0, len(new), new
+
+        index.update([(3, 4, "(x)")], read, change_count=1)
+
+        self.assertEquals(index.change_count, 1)
+        self.assertEquals(index.enclosing(9, "("), (8, 10))
+        self.assertEquals(index.enclosing(4, "("), (3, 5))
+        self.assertIsNone(index.enclosing(7, "("))
+        self.assertEquals(len(index), len(BracketIndex(new, BRACKETS)))
+
+    def testCanUpdateAfterManyChanges(self):
+        new = "(b)\n[a]"
+        index = BracketIndex("(a)\n[b]", BRACKETS, change_count=0)
+
+        def read(begin, end):
+            lines_begin = new.rfind("\n", 0, begin) + 1
+            lines_end = new.find("\n", end)
+            lines_end = len(new) if lines_end < 0 else lines_end
+            return lines_begin, lines_end, new[lines_begin:lines_end]
+
+        index.update([(1, 2, "b"), (5, 6, "a")], read, change_count=2)
+
+        self.assertEquals(index.enclosing(1, "("), (0, 2))
+        self.assertEquals(index.enclosing(5, "["), (4, 6))
+
+    def testDoesNotPairUpAgainAfterUpdate(self):
+        old = "a(b(c) d(e)) (f " * 200
+        new = "(" + old
+        index = BracketIndex(old, BRACKETS, change_count=0)
+
+        def read(begin, end):
+            return 0, new.find(" "), new[:new.find(" ")]
+
+        index.update([(0, 0, "(")], read, change_count=1)
+        with mock.patch("User.six.index._Table.match") as match:
+            found = [index.enclosing(pt, "(", count)
+                     for pt in range(len(new) + 1) for count in (1, 2, 3)]
+
+        self.assertFalse(match.called)
+        fresh = BracketIndex(new, BRACKETS)
+        self.assertEquals(found, [fresh.enclosing(pt, "(", count)
+                                  for pt in range(len(new) + 1)
+                                  for count in (1, 2, 3)])
+
+
+class Test_IndexCache(unittest.TestCase):
+
+    def testCountsHitsAndMisses(self):
+        cache = IndexCache(budget=1024 * 1024)
+
+        self.assertIsNone(cache.get(1, 0))
+        cache.put(1, BracketIndex("()", BRACKETS, change_count=0))
+        self.assertIsNotNone(cache.get(1, 0))
+
+        self.assertEquals(cache.hits, 1)
+        self.assertEquals(cache.misses, 1)
+
+    def testDropsStaleIndexes(self):
+        cache = IndexCache(budget=1024 * 1024)
+        cache.put(1, BracketIndex("()", BRACKETS, change_count=0))
+
+        self.assertIsNone(cache.get(1, 1))
+        self.assertIsNone(cache.get(1, 0))
+
+    def testEvictsLeastRecentlyUsed(self):
+        index = BracketIndex("()" * 100, BRACKETS, change_count=0)
+        cache = IndexCache(budget=int(index.nbytes * 2.5))
+        cache.put(1, index)
+        cache.put(2, BracketIndex("()" * 100, BRACKETS, change_count=0))
+        cache.get(1, 0)
+        cache.put(3, BracketIndex("()" * 100, BRACKETS, change_count=0))
+
+        self.assertIsNotNone(cache.peek(1, 0))
+        self.assertIsNone(cache.peek(2, 0))
+        self.assertIsNotNone(cache.peek(3, 0))
@@ -0,0 +1,48 @@
+import unittest
+
+from User.six.motions import find_motion
+
+LINE = "  foo.bar  baz"
+
+
+def covered(motion, offset, count=1):
+    span = find_motion(LINE, offset, motion, count)
+    return LINE[span[0]:span[1]] if span else None
+
+
+class Test_find_motion(unittest.TestCase):
+
+    def testCanFindInnerWord(self):
+        self.assertEquals(covered("iw", 3), "foo")
+        self.assertEquals(covered("iw", 5), ".")
+        self.assertEquals(covered("iW", 3), "foo.bar")
+
+    def testCanFindAWord(self):
+        self.assertEquals(covered("aw", 3), "  foo")
+        self.assertEquals(covered("aw", 7), "bar")
+        self.assertEquals(covered("aW", 3), "foo.bar")
+
+    def testCanFindWordMotion(self):
+        self.assertEquals(covered("w", 2), "foo")
+        self.assertEquals(covered("W", 2), "foo.bar")
+        self.assertEquals(covered("w", 2, count=2), "foo.")
+        self.assertEquals(covered("w", 11), "baz")
+
+    def testCanFindEndOfWordMotion(self):
+        self.assertEquals(covered("e", 2), "foo")
+        self.assertEquals(covered("e", 4), "o.")
+        self.assertEquals(covered("E", 2), "foo.bar")
+        self.assertEquals(covered("e", 2, count=3), "foo.bar")
+
+    def testCanFindLine(self):
+        self.assertEquals(covered("$", 6), "bar  baz")
+        self.assertEquals(covered("s", 6), "foo.bar  baz")
+
+    def testLeavesTrailingBlanksOut(self):
+        self.assertEquals(find_motion("foo bar", 0, "w"), (0, 3))
+        self.assertEquals(find_motion("foo bar  ", 4, "$"), (4, 7))
+        self.assertEquals(find_motion("foo   ", 4, "$"), (4, 6))
+
+    def testReturnsNoneAtEndOfLine(self):
+        self.assertIsNone(covered("iw", len(LINE)))
+        self.assertIsNone(covered("$", len(LINE)))
@@ -0,0 +1,218 @@
+import unittest
+from unittest import mock
+
+from User.six import pairs
+from User.six.pairs import find_all_pairs
+from User.six.pairs import find_call_name
+from User.six.pairs import find_enclosing
+from User.six.pairs import find_quote_pair
+from User.six.pairs import find_quotes
+from User.six.pairs import quote_pairs
+
+
+class RecordingPattern(object):
+    """Wraps a compiled pattern, remembering where each search began.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.starts = []
+
+    def finditer(self, text, pos, endpos):
+        self.starts.append(pos)
+        return self.pattern.finditer(text, pos, endpos)
+
+
+class Test_find_enclosing(unittest.TestCase):
+
+    def testReturnsNoneIfNotFound(self):
+        self.assertIsNone(find_enclosing("aaa bbb", 2, "(", ")"))
+
+    def testReturnsNoneIfNotClosed(self):
+        self.assertIsNone(find_enclosing("aaa (bbb", 6, "(", ")"))
+
+    def testCanFindPair(self):
+        self.assertEquals(find_enclosing("aaa (bbb) ccc", 6, "(", ")"), (4, 8))
+
+    def testSkipsNestedPairs(self):
+        text = "f(a(b)c)"
+
+        self.assertEquals(find_enclosing(text, 6, "(", ")"), (1, 7))
+        self.assertEquals(find_enclosing(text, 2, "(", ")"), (1, 7))
+        self.assertEquals(find_enclosing(text, 4, "(", ")"), (3, 5))
+
+    def testCanFindPairAcrossLines(self):
+        self.assertEquals(find_enclosing("x(\n a,\n b)", 5, "(", ")"), (1, 9))
+
+    def testCaretOnOpenerBelongsToPair(self):
+        self.assertEquals(find_enclosing("f(a(b)c)", 3, "(", ")"), (3, 5))
+
+    def testCaretOnCloserBelongsToPair(self):
+        self.assertEquals(find_enclosing("f(a(b)c)", 5, "(", ")"), (3, 5))
+
+    def testCaretInsideMultiCharacterOpenerBelongsToPair(self):
+        self.assertEquals(find_enclosing("a{% x %}b", 2, "{%", "%}"), (1, 6))
+        self.assertEquals(find_enclosing("éé%{%}}xé", 4, "{%", "%}"), (3, 4))
+
+    def testCaretInsideMultiCharacterCloserBelongsToPair(self):
+        self.assertEquals(find_enclosing("a{% x %}b", 7, "{%", "%}"), (1, 6))
+
+    def testHonorsBounds(self):
+        text = "(aaa bbb ccc)"
+
+        self.assertIsNone(find_enclosing(text, 6, "(", ")", lo=2))
+        self.assertIsNone(find_enclosing(text, 6, "(", ")", hi=10))
+
+    def testCanFindOuterPair(self):
+        text = "a(b(c(d)))"
+
+        self.assertEquals(find_enclosing(text, 6, "(", ")", count=2), (3, 8))
+        self.assertEquals(find_enclosing(text, 6, "(", ")", count=3), (1, 9))
+        self.assertIsNone(find_enclosing(text, 6, "(", ")", count=4))
+
+    def testCanIgnoreDelimiters(self):
+        text = "f(\")\", x)"
+
+        def ignore(offset):
+            return offset == 3
+
+        self.assertEquals(find_enclosing(text, 7, "(", ")", ignore=ignore), (1, 8))
+
+    def testBackwardScanStopsAtEnclosingPair(self):
+        text = "(" * 10000 + "(x)"
+        pattern = RecordingPattern(pairs._pattern("(", ")"))
+        pairs._patterns["(", ")"] = pattern
+        try:
+            # Ignoring delimiters takes the scan visiting them one by one.
+            self.assertEquals(find_enclosing(text, 10001, "(", ")",
+                                             ignore=lambda offset: False),
+                              (10000, 10002))
+        finally:
+            pairs._patterns["(", ")"] = pattern.pattern
+
+        self.assertTrue(min(pattern.starts) > 10000 - 2 * pairs.CHUNK_SIZE)
+
+    def testDepthScanStopsAtEnclosingPair(self):
+        text = "(" * 10000 + "(x)" + ")" * 10000
+        chunks = []
+
+        def first_depth(deltas, depth):
+            chunks.append(deltas)
+            return first_depth.wrapped(deltas, depth)
+
+        first_depth.wrapped = pairs.first_depth
+        with mock.patch("User.six.pairs.first_depth", first_depth):
+            self.assertEquals(find_enclosing(text, 10001, "(", ")"), (10000, 10002))
+
+        self.assertEquals(len(chunks), 2)
+        self.assertTrue(sum(map(len, chunks)) <= 2 * pairs.CHUNK_SIZE)
+
+    def testDepthScanCanFindOuterPairsAcrossChunks(self):
+        text = "f(" + "(x)" * 1000 + "[(" + "y" * 1000 + ")]" + ")"
+
+        self.assertEquals(find_enclosing(text, 3500, "(", ")", count=2),
+                          (1, len(text) - 1))
+        self.assertEquals(find_enclosing(text, 3500, "[", "]"), (3002, 4005))
+
+    def testDepthScanMatchesDelimiterByDelimiterScan(self):
+        text = "é(a(b\n)c)d)(e[(f)]" * 40
+        for offset in range(0, len(text), 7):
+            for count in (1, 2, 3):
+                self.assertEquals(
+                    find_enclosing(text, offset, "(", ")", count=count),
+                    find_enclosing(text, offset, "(", ")", count=count,
+                                   ignore=lambda offset: False))
+
+
+class Test_find_all_pairs(unittest.TestCase):
+
+    def testCanFindNestedPairs(self):
+        self.assertEquals(list(find_all_pairs(["f(a(b)c)"], "(", ")")),
+                          [(3, 5), (1, 7)])
+
+    def testSkipsUnmatchedDelimiters(self):
+        self.assertEquals(list(find_all_pairs([") (a) ("], "(", ")")), [(2, 4)])
+
+    def testPairsQuotesWithinLines(self):
+        self.assertEquals(list(find_all_pairs(["'a' 'b\n' 'c'"], "'", "'")),
+                          [(0, 2), (7, 9)])
+
+    def testSkipsEscapedDelimiters(self):
+        text = "'it\\'s' '\\\\'"
+
+        self.assertEquals(list(find_all_pairs([text], "'", "'")), [(0, 6), (8, 11)])
+
+    def testPairsQuotesWithinLinesEndingInBackslash(self):
+        text = "echo \"don't\" \\\n  --name 'x'"
+
+        self.assertEquals(list(find_all_pairs([text], "'", "'")), [(24, 26)])
+        self.assertEquals(list(find_all_pairs([text], '"', '"')), [(5, 11)])
+
+    def testCanFindMultiCharacterDelimiters(self):
+        self.assertEquals(list(find_all_pairs(["/* a */ */"], "/*", "*/")), [(0, 5)])
+
+    def testDelimitersMayStraddleChunks(self):
+        text = "x /* 'a\\'' */ y"
+        for i in range(len(text) + 1):
+            chunks = [text[:i], text[i:]]
+            self.assertEquals(list(find_all_pairs(chunks, "/*", "*/")), [(2, 11)])
+            self.assertEquals(list(find_all_pairs(chunks, "'", "'")), [(5, 9)])
+
+
+class Test_quote_pairs(unittest.TestCase):
+
+    def testPairsQuotesInOrder(self):
+        self.assertEquals(list(quote_pairs('a "x" b "y" c', '"')), [2, 4, 8, 10])
+
+    def testSkipsEscapedAndUnpairedQuotes(self):
+        self.assertEquals(list(quote_pairs('"a\\"b" "c', '"')), [0, 5])
+
+    def testPairsWithinLinesEndingInBackslash(self):
+        self.assertEquals(list(quote_pairs("'a \\\nb 'c'", "'")), [7, 9])
+
+
+class Test_find_quote_pair(unittest.TestCase):
+
+    def testFindsPairAroundOffset(self):
+        pairs = quote_pairs('a "x" b "y" c', '"')
+
+        self.assertEquals(find_quote_pair(pairs, 3), (2, 4))
+        self.assertEquals(find_quote_pair(pairs, 9), (8, 10))
+
+    def testFindsPairOfQuoteAtOffset(self):
+        pairs = quote_pairs('a "x" b "y" c', '"')
+
+        self.assertEquals(find_quote_pair(pairs, 2), (2, 4))
+        self.assertEquals(find_quote_pair(pairs, 4), (2, 4))
+
+    def testFindsNextPairBetweenPairs(self):
+        pairs = quote_pairs('a "x" b "y" c', '"')
+
+        self.assertEquals(find_quote_pair(pairs, 0), (2, 4))
+        self.assertEquals(find_quote_pair(pairs, 6), (8, 10))
+        self.assertIsNone(find_quote_pair(pairs, 12))
+
+    def testCanFindMultiCharacterQuotes(self):
+        pairs = quote_pairs('x """a""" y', '"""')
+
+        self.assertEquals(find_quote_pair(pairs, 7, size=3), (2, 6))
+
+
+class Test_find_quotes(unittest.TestCase):
+
+    def testPairsQuotesFromLineStart(self):
+        text = 'a "x" b\n"y" c "z"'
+
+        self.assertEquals(find_quotes(text, 3, '"'), (2, 4))
+        self.assertEquals(find_quotes(text, 11, '"'), (14, 16))
+        self.assertIsNone(find_quotes(text, 6, '"'))
+
+
+class Test_find_call_name(unittest.TestCase):
+
+    def testFindsNameBeforeParenthesis(self):
+        self.assertEquals(find_call_name("x = foo_1(a)", 9), 4)
+
+    def testReturnsOffsetWithoutName(self):
+        self.assertEquals(find_call_name("x = (a)", 4), 4)
+        self.assertEquals(find_call_name("(a)", 0), 0)
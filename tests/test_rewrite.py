@@ -0,0 +1,44 @@
+import unittest
+
+from User.six.rewrite import apply_edits
+from User.six.rewrite import change_edits
+from User.six.rewrite import delete_edits
+
+
+class Test_change_edits(unittest.TestCase):
+
+    def testReplacesBothDelimiters(self):
+        self.assertEquals(change_edits([(0, 2, 5, 7)], "(", ")"),
+                          {0: (2, "("), 5: (2, ")")})
+
+    def testKeepsOneEditForRepeatedPairs(self):
+        self.assertEquals(change_edits([(0, 1, 4, 5), (0, 1, 4, 5)], "[", "]"),
+                          {0: (1, "["), 4: (1, "]")})
+
+
+class Test_delete_edits(unittest.TestCase):
+
+    def testErasesBothDelimiters(self):
+        self.assertEquals(delete_edits([(1, 2, 3, 4)]), {1: (1, ""), 3: (1, "")})
+
+
+class Test_apply_edits(unittest.TestCase):
+
+    def testAppliesEditsAcrossChunks(self):
+        text = "f('a', 'bc')"
+        edits = change_edits([(2, 3, 4, 5), (7, 8, 10, 11)], "<em>", "</em>")
+        for i in range(len(text) + 1):
+            for j in range(i, len(text) + 1):
+                chunks = [text[:i], text[i:j], text[j:]]
+                self.assertEquals("".join(apply_edits(chunks, edits)),
+                                  "f(<em>a</em>, <em>bc</em>)")
+
+    def testEditsMayStraddleChunks(self):
+        edits = delete_edits([(2, 4, 7, 9)])
+
+        self.assertEquals("".join(apply_edits(["x /", "* a *", "/ y"], edits)),
+                          "x  a  y")
+
+    def testCanInsertAtEnd(self):
+        self.assertEquals("".join(apply_edits(["ab"], {0: (0, "("), 2: (0, ")")})),
+                          "(ab)")
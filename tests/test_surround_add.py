@@ -0,0 +1,104 @@
+from sublime import Region as R
+
+from User.six.tests import ViewTest
+
+
+class Test__six_surround_add(ViewTest):
+
+    def testCanSurroundMotion(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_add", { "new": "(", "motion": "iw" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa (bbb) ccc")
+
+    def testCanSurroundWithFunctionCall(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_add", { "new": "f(", "motion": "iw" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa f(bbb) ccc")
+
+    def testLeavesTrailingBlanksOutside(self):
+        self.view.run_command("append", { "characters": "foo bar" })
+        self.view.sel().clear()
+        self.view.sel().add(R(0))
+
+        self.view.run_command("_six_surround_add", { "new": "(", "motion": "w" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "(foo) bar")
+
+    def testCanSurroundMotionAtEveryCaret(self):
+        self.view.run_command("append", { "characters": "aaa bbb\nccc ddd" })
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+        self.view.sel().add(R(9))
+
+        self.view.run_command("_six_surround_add", { "new": "'", "motion": "s" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "'aaa bbb'\n'ccc ddd'")
+
+    def testCanSurroundSelections(self):
+        self.view.run_command("append", { "characters": "aaa bbb\nccc ddd" })
+        self.view.sel().clear()
+        self.view.sel().add(R(0, 3))
+        self.view.sel().add(R(12, 15))
+
+        self.view.run_command("_six_surround_add", { "new": "[" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "[aaa] bbb\nccc [ddd]")
+
+    def testCanSurroundTouchingSelections(self):
+        self.view.run_command("append", { "characters": "aaabbb" })
+        self.view.sel().clear()
+        self.view.sel().add(R(0, 3))
+        self.view.sel().add(R(3, 6))
+
+        self.view.run_command("_six_surround_add", { "new": "{" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "{aaa}{bbb}")
+
+    def testCanSurroundLinesAtEndOfBuffer(self):
+        self.view.run_command("append", { "characters": "aaa\nbbb" })
+        self.view.sel().clear()
+        self.view.sel().add(R(4, 7))
+
+        self.view.run_command("_six_surround_add", { "new": "[", "linewise": True })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa\n[\nbbb\n]")
+
+    def testCanUndoInOneStep(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_add", { "new": '"', "motion": "iw" })
+        self.view.run_command("undo")
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa bbb ccc")
+
+    def testLeavesTextAloneForUnknownDelimiters(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_add", { "new": "q", "motion": "iw" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa bbb ccc")
+
+    def testCanSurroundWithTag(self):
+        self.view.run_command("append", { "characters": "aaa bbb ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_add", {
+            "new": "<a href='x'>", "motion": "iw" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "aaa <a href='x'>bbb</a> ccc")
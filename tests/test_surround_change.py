@@ -1,5 +1,6 @@
 import os
 import unittest
+from unittest import mock
 
 import sublime
 
@@ -13,6 +14,8 @@ from Six.lib.errors import AbortCommandError
 from Six.lib.yank_registers import EditOperation
 
 from User.six.surround import find_in_line
+from User.six.surround import get_quote_index
+from User.six.surround import speculate_pairs
 from User.six.surround import BRACKETS
 
 
@@ -57,3 +60,234 @@ class Test__six_surround_change_Success(ViewTest):
 
         self.assertEquals(self.view.substr(4), "'")
         self.assertEquals(self.view.substr(8), "'")
+
+    def testCanReplaceAtEveryCaret(self):
+        self.view.run_command("append", { "characters": "a 'b' c\nd 'e' f 'g'" })
+        self.view.sel().clear()
+        self.view.sel().add(R(3))
+        self.view.sel().add(R(11))
+        self.view.sel().add(R(17))
+
+        self.view.run_command("_six_surround_change", { "old": "'", "new": "(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "a (b) c\nd (e) f (g)")
+
+    def testReplacesSharedPairOnce(self):
+        self.view.run_command("append", { "characters": "a [bbb] c" })
+        self.view.sel().clear()
+        self.view.sel().add(R(3))
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_change", { "old": "[", "new": "{" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "a {bbb} c")
+
+    def testCanReplaceNestedBrackets(self):
+        self.view.run_command("append", { "characters": "f(a(b)c)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(6))
+
+        self.view.run_command("_six_surround_change", { "old": "(", "new": "[" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "f[a(b)c]")
+
+    def testCanReplaceBracketsAcrossLines(self):
+        self.view.run_command("append", { "characters": "f(\n  a,\n  b\n)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_change", { "old": "(", "new": "{" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "f{\n  a,\n  b\n}")
+
+    def testCanReplaceTags(self):
+        self.view.run_command("append", { "characters": "<div id='a'><b>x</b></div>" })
+        self.view.sel().clear()
+        self.view.sel().add(R(13))
+
+        self.view.run_command("_six_surround_change", { "old": "t", "new": "<p>" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "<div id='a'><p>x</p></div>")
+
+    def testCanReplaceQuotesWithTag(self):
+        self.view.run_command("append", { "characters": "aaa 'bbb' ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_change", { "old": "'", "new": "<em>" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "aaa <em>bbb</em> ccc")
+
+    def testCanReplaceAliases(self):
+        self.view.run_command("append", { "characters": "f(a)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(2))
+
+        self.view.run_command("_six_surround_change", { "old": "b", "new": "B" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "f{a}")
+
+    def testCanReplaceMultiCharacterDelimiters(self):
+        BRACKETS.add("c", "/*", "*/")
+        self.addCleanup(BRACKETS.remove, "c")
+        self.view.run_command("append", { "characters": "x /* (a) */ y" })
+        self.view.sel().clear()
+        self.view.sel().add(R(6))
+
+        self.view.run_command("_six_surround_change", { "old": "c", "new": "(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "x ( (a) ) y")
+
+
+class Test__six_surround_change_Functions(ViewTest):
+
+    def testCanRenameFunctionCalls(self):
+        self.view.run_command("append", { "characters": "x = foo(a)\ny = foo(b)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(8))
+        self.view.sel().add(R(19))
+
+        self.view.run_command("_six_surround_change", { "old": "f", "new": "bar(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "x = bar(a)\ny = bar(b)")
+
+    def testCanTurnParenthesesIntoCalls(self):
+        self.view.run_command("append", { "characters": "x = (a)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_change", { "old": "(", "new": "f(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "x = f(a)")
+
+    def testCanTurnCallsIntoOtherDelimiters(self):
+        self.view.run_command("append", { "characters": "x = foo(a)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(8))
+
+        self.view.run_command("_six_surround_change", { "old": "f", "new": "[" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "x = [a]")
+
+
+class Test__six_surround_change_Speculation(ViewTest):
+
+    def testLeavesTextAloneForUnknownDelimiters(self):
+        self.view.run_command("append", { "characters": "aaa 'bbb' ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_change", { "old": "'", "new": "x" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "aaa 'bbb' ccc")
+
+    def testUsesSpeculatedPairs(self):
+        self.view.run_command("append", { "characters": "aaa 'bbb' ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        speculate_pairs(self.view, "'")
+        with mock.patch("User.six.surround.find_pairs") as find_pairs:
+            self.view.run_command("_six_surround_change", { "old": "'", "new": '"' })
+
+        self.assertFalse(find_pairs.called)
+        self.assertEquals(self.view.substr(R(0, self.view.size())), 'aaa "bbb" ccc')
+
+    def testSpeculatesOnMainThread(self):
+        self.view.run_command("append", { "characters": "aaa 'bbb' ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        with mock.patch("sublime.set_timeout_async") as set_timeout_async:
+            speculate_pairs(self.view, "'")
+
+        self.assertFalse(set_timeout_async.called)
+
+    def testDiscardsSpeculatedPairsIfBufferChanges(self):
+        self.view.run_command("append", { "characters": "aaa 'bbb' ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        speculate_pairs(self.view, "'")
+        self.view.run_command("insert", { "characters": "xx" })
+        self.view.run_command("_six_surround_change", { "old": "'", "new": '"' })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), 'aaa "xxbbb" ccc')
+
+    def testDiscardsSpeculatedPairsIfSelectionChanges(self):
+        self.view.run_command("append", { "characters": "(a) (b)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+
+        speculate_pairs(self.view, "(")
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+        self.view.run_command("_six_surround_change", { "old": "(", "new": "[" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "(a) [b]")
+
+    def testDiscardsSpeculatedPairsForOtherDelimiters(self):
+        self.view.run_command("append", { "characters": "('a')" })
+        self.view.sel().clear()
+        self.view.sel().add(R(2))
+
+        speculate_pairs(self.view, "(")
+        self.view.run_command("_six_surround_change", { "old": "'", "new": '"' })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), '("a")')
+
+
+class Test__six_surround_change_Quotes(ViewTest):
+
+    def change(self, text, pt, old, new):
+        self.view.run_command("append", { "characters": text })
+        self.view.sel().clear()
+        self.view.sel().add(R(pt))
+
+        self.view.run_command("_six_surround_change", { "old": old, "new": new })
+
+        return self.view.substr(R(0, self.view.size()))
+
+    def testChangesPairAroundCaret(self):
+        self.assertEquals(self.change('a "x" b "y" c', 3, '"', "'"), 'a \'x\' b "y" c')
+
+    def testChangesNextPairBetweenPairs(self):
+        self.assertEquals(self.change('a "x" b "y" c', 6, '"', "'"), 'a "x" b \'y\' c')
+
+    def testChangesPairOfQuoteUnderCaret(self):
+        self.assertEquals(self.change('a "x" b "y" c', 10, '"', "'"), 'a "x" b \'y\' c')
+
+    def testSkipsEscapedQuotes(self):
+        self.assertEquals(self.change('f("a \\" b")', 4, '"', "'"), "f('a \\\" b')")
+
+    def testPairsWithinLinesEndingInBackslash(self):
+        text = "echo \"don't\" \\\n  --name 'x'"
+        expected = "echo \"don't\" \\\n  --name \"x\""
+
+        self.assertEquals(self.change(text, 25, "'", '"'), expected)
+
+    def testPairsWithinLinesEndingInBackslashAtEveryCaret(self):
+        self.view.run_command("append", {
+            "characters": "echo \"don't\" \\\n  --name 'x'" })
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+        self.view.sel().add(R(25))
+
+        self.view.run_command("_six_surround_change", { "old": "'", "new": '"' })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "echo \"don't\" \\\n  --name \"x\"")
+
+    def testReusesIndexUntilBufferChanges(self):
+        self.view.run_command("append", { "characters": '"a" "b"' })
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+        quotes = get_quote_index(self.view)
+
+        self.assertIs(get_quote_index(self.view), quotes)
+        self.view.run_command("_six_surround_change", { "old": '"', "new": "'" })
+        self.assertIsNot(get_quote_index(self.view), quotes)
@@ -0,0 +1,82 @@
+from unittest import mock
+
+from sublime import Region as R
+
+from User.six import surround
+from User.six.tests import ViewTest
+
+
+class Test_six_surround_convert(ViewTest):
+
+    def testConvertsWholeBuffer(self):
+        self.view.run_command("append", { "characters": "a = ['x', 'y']\nb = 'z'" })
+
+        self.view.run_command("six_surround_convert", { "old": "'", "new": '"' })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          'a = ["x", "y"]\nb = "z"')
+
+    def testConvertsSelectedTextOnly(self):
+        self.view.run_command("append", { "characters": "f(a) g(b) h(c)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5, 9))
+
+        self.view.run_command("six_surround_convert", { "old": "(", "new": "[" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "f(a) g[b] h(c)")
+
+    def testConvertsNestedPairs(self):
+        self.view.run_command("append", { "characters": "[a, [b], c]" })
+
+        self.view.run_command("six_surround_convert", { "old": "r", "new": "(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "(a, (b), c)")
+
+    def testLeavesEscapedAndUnmatchedDelimitersAlone(self):
+        self.view.run_command("append", { "characters": "'it\\'s' 'x" })
+
+        self.view.run_command("six_surround_convert", { "old": "'", "new": '"' })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), '"it\\\'s" \'x')
+
+    def testPairsQuotesWithinLinesEndingInBackslash(self):
+        self.view.run_command("append", {
+            "characters": "echo \"don't\" \\\n  --name 'x'" })
+
+        self.view.run_command("six_surround_convert", { "old": "'", "new": '"' })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "echo \"don't\" \\\n  --name \"x\"")
+
+    def testCanConvertToTags(self):
+        self.view.run_command("append", { "characters": "'a' 'b'" })
+
+        self.view.run_command("six_surround_convert", { "old": "'", "new": "<em>" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "<em>a</em> <em>b</em>")
+
+    def testLeavesTextAloneForUnknownDelimiters(self):
+        self.view.run_command("append", { "characters": "f('a', 'b')" })
+
+        self.view.run_command("six_surround_convert", { "old": "'", "new": "x" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "f('a', 'b')")
+
+    def testReadsInChunks(self):
+        text = "('a')" * 100
+        self.view.run_command("append", { "characters": text })
+
+        chunks = []
+        read_chunks = surround.read_chunks
+
+        def read_small_chunks(view, region):
+            for chunk in read_chunks(view, region, size=7):
+                chunks.append(chunk)
+                yield chunk
+
+        with mock.patch("User.six.surround.read_chunks", read_small_chunks):
+            self.view.run_command("six_surround_convert", { "old": "'", "new": '"' })
+
+        self.assertEquals(len(chunks), len(text) // 7 + 1)
+        self.assertEquals(self.view.substr(R(0, self.view.size())), '("a")' * 100)
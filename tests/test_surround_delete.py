@@ -64,3 +64,83 @@ class Test__six_surround_delete(ViewTest):
 
         self.assertEquals(self.view.substr(4), "'")
         self.assertEquals(self.view.substr(8), "'")
+
+    def testCanDeleteAtEveryCaret(self):
+        self.view.run_command("append", { "characters": "a (b) c\nd (e) f (g)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(3))
+        self.view.sel().add(R(11))
+        self.view.sel().add(R(17))
+
+        self.view.run_command("_six_surround_delete", { "old": "(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "a b c\nd e f g")
+
+    def testCanIgnoreBracketsInStrings(self):
+        self.view.assign_syntax("Packages/Python/Python.sublime-syntax")
+        self.view.settings().set("six_surround_ignore_strings_and_comments", True)
+        self.view.run_command("append", { "characters": 'f("(", x)' })
+        self.view.sel().clear()
+        self.view.sel().add(R(6))
+
+        self.view.run_command("_six_surround_delete", { "old": "(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), 'f"(", x')
+
+    def testDoesNotIgnoreBracketsInStringsByDefault(self):
+        self.view.assign_syntax("Packages/Python/Python.sublime-syntax")
+        self.view.run_command("append", { "characters": 'f("(", x)' })
+        self.view.sel().clear()
+        self.view.sel().add(R(6))
+
+        self.view.run_command("_six_surround_delete", { "old": "(" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), 'f("", x')
+
+    def testCanDeleteOuterPair(self):
+        self.view.run_command("append", { "characters": "a(b(c(d)))" })
+        self.view.sel().clear()
+        self.view.sel().add(R(7))
+
+        self.view.run_command("_six_surround_delete", { "old": "(", "count": 2 })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "a(bc(d))")
+
+    def testCanDeleteTags(self):
+        self.view.run_command("append", { "characters": "<div>\n  <b>x</b>\n</div>" })
+        self.view.sel().clear()
+        self.view.sel().add(R(10))
+
+        self.view.run_command("_six_surround_delete", { "old": "t", "count": 2 })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "\n  <b>x</b>\n")
+
+    def testCanDeleteFunctionCalls(self):
+        self.view.run_command("append", { "characters": "x = foo(a, bar(b)) + baz(c)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(9))
+        self.view.sel().add(R(25))
+
+        self.view.run_command("_six_surround_delete", { "old": "f" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "x = a, bar(b) + c")
+
+    def testCanDeleteParenthesesWithoutName(self):
+        self.view.run_command("append", { "characters": "x = (a) + 1" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.view.run_command("_six_surround_delete", { "old": "f" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "x = a + 1")
+
+    def testReadsLongFunctionNames(self):
+        name = "f" * 1000
+        self.view.run_command("append", { "characters": "x = %s(a)" % name })
+        self.view.sel().clear()
+        self.view.sel().add(R(len(name) + 5))
+
+        self.view.run_command("_six_surround_delete", { "old": "f" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "x = a")
@@ -1,5 +1,6 @@
 import os
 import unittest
+from unittest import mock
 
 import sublime
 
@@ -13,6 +14,13 @@ from Six.lib.errors import AbortCommandError
 from Six.lib.yank_registers import EditOperation
 
 from User.six.surround import find_in_line
+from User.six.surround import find_pairs
+from User.six.surround import build_index_async
+from User.six.surround import get_index
+from User.six.surround import _six_surround_index_listener
+from User.six.surround import TextWindow
+from User.six.surround import update_index
+from User.six.surround import LONG_LINE_WINDOW
 from User.six.surround import BRACKETS
 
 
@@ -53,3 +61,352 @@ class Test_find_in_line(ViewTest):
         rv = find_in_line(self.view, "x", forward=False)
 
         self.assertEquals(rv, 4)
+
+    def testSearchesLongLinesInWindowsInLargeFiles(self):
+        text = "a" * (3 * LONG_LINE_WINDOW) + "x"
+        self.view.run_command("append", { "characters": "x" + text })
+        self.view.settings().set("six_surround_large_file_threshold", 0)
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+
+        self.assertEquals(find_in_line(self.view, "x"), len(text))
+        self.assertEquals(find_in_line(self.view, "x", forward=False), 0)
+
+    def testStopsAtSearchCapInLargeFiles(self):
+        self.view.run_command("append", { "characters": "x" + "a" * 100 + "x" })
+        self.view.settings().set("six_surround_large_file_threshold", 0)
+        self.view.settings().set("six_surround_large_file_search_cap", 50)
+        self.view.sel().clear()
+        self.view.sel().add(R(51))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertTrue(find_in_line(self.view, "x") < 0)
+            self.assertTrue(find_in_line(self.view, "x", forward=False) < 0)
+
+        self.assertEquals(status_message.call_count, 2)
+
+    def testStopsAtTimeBudgetInLargeFiles(self):
+        self.view.run_command("append", {
+            "characters": "a" * (2 * LONG_LINE_WINDOW) + "x" })
+        self.view.settings().set("six_surround_large_file_threshold", 0)
+        self.view.settings().set("six_surround_large_file_time_budget", -1)
+        self.view.sel().clear()
+        self.view.sel().add(R(0))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertTrue(find_in_line(self.view, "x") < 0)
+
+        self.assertTrue(status_message.called)
+
+    def testStaysInCaretLineInLargeFiles(self):
+        self.view.run_command("append", { "characters": "x\naxa\nx" })
+        self.view.settings().set("six_surround_large_file_threshold", 0)
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        self.assertEquals(find_in_line(self.view, "x", forward=False), 3)
+        self.assertTrue(find_in_line(self.view, "x") < 0)
+
+        self.view.sel().clear()
+        self.view.sel().add(R(2))
+
+        self.assertTrue(find_in_line(self.view, "x", forward=False) < 0)
+
+    def testSaysNothingIfNotInLineInLargeFiles(self):
+        self.view.run_command("append", { "characters": "aaa\nbbb" })
+        self.view.settings().set("six_surround_large_file_threshold", 0)
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertTrue(find_in_line(self.view, "x") < 0)
+
+        self.assertFalse(status_message.called)
+
+    def testCanAnswerFromIndex(self):
+        self.view.run_command("append", { "characters": "(a)\n(b(c)\n(d)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(7))
+
+        self.assertIsNotNone(get_index(self.view))
+
+        self.assertEquals(find_in_line(self.view, ")"), 8)
+        self.assertEquals(find_in_line(self.view, "(", forward=False), 6)
+        self.assertTrue(find_in_line(self.view, "[") < 0)
+
+    def testIndexSkipsChangesItHasAlready(self):
+        self.view.run_command("append", { "characters": "(a)" })
+        index = get_index(self.view)
+
+        # Reported late, after the index was built from the new text.
+        update_index(self.view, [(0, 0, "(a)", 0)])
+
+        self.assertEquals(len(index), 2)
+        self.assertEquals(index.enclosing(1, "("), (0, 2))
+
+    def testIndexTakesChangesMadeAfterIt(self):
+        self.view.run_command("append", { "characters": "(a)" })
+        index = get_index(self.view)
+
+        self.view.run_command("append", { "characters": "(b)" })
+        update_index(self.view, [(3, 3, "(b)", 1)])
+
+        self.assertIs(get_index(self.view), index)
+        self.assertEquals(index.enclosing(4, "("), (3, 5))
+
+    def testDropsIndexMissingChanges(self):
+        self.view.run_command("append", { "characters": "a\n(b)\n" })
+        self.view.sel().clear()
+        self.view.sel().add(R(0))
+        self.view.run_command("insert", { "characters": "XX" })
+        index = get_index(self.view)
+        self.view.run_command("append", { "characters": "z" })
+
+        # Reported late, after the buffer changed again.
+        update_index(self.view, [(0, 0, "XX", 1)])
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+        self.view.run_command("_six_surround_delete", { "old": "(" })
+
+        self.assertIsNot(get_index(self.view), index)
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "XXa\nb\nz")
+
+
+class Test_find_pairs_LargeFiles(ViewTest):
+
+    def setUp(self):
+        super().setUp()
+        self.view.settings().set("six_surround_large_file_threshold", 0)
+        self.view.settings().set("six_surround_index_budget", 0)
+
+    def countCharactersRead(self):
+        # Return a list the lengths of the text read from the view go into.
+        read = []
+        substr = self.view.substr
+
+        def counting_substr(x):
+            text = substr(x)
+            read.append(len(text))
+            return text
+        patch = mock.patch.object(self.view, "substr", counting_substr)
+        patch.start()
+        self.addCleanup(patch.stop)
+        return read
+
+    def testReadsLongLinesAroundCaretsOnly(self):
+        long = "a" * (8 * LONG_LINE_WINDOW)
+        self.view.run_command("append", { "characters": long + "\n'x'" + long })
+        self.view.sel().clear()
+        self.view.sel().add(R(len(long) + 2))
+        read = self.countCharactersRead()
+
+        a = len(long) + 1
+        self.assertEquals(find_pairs(self.view, "'"), [(a, a + 1, a + 2, a + 3)])
+        self.assertTrue(sum(read) <= 2 * LONG_LINE_WINDOW + 2)
+
+    def testFindsQuotesInLongLines(self):
+        text = "'" + "a" * (3 * LONG_LINE_WINDOW) + "'"
+        self.view.run_command("append", { "characters": "x\n" + text })
+        self.view.sel().clear()
+        self.view.sel().add(R(3))
+
+        self.assertEquals(find_pairs(self.view, "'"),
+                          [(2, 3, len(text) + 1, len(text) + 2)])
+
+    def testGivesUpOnQuotesPastSearchCap(self):
+        self.view.run_command("append", { "characters": "a" * 100 + "'x'" })
+        self.view.settings().set("six_surround_large_file_search_cap", 50)
+        self.view.sel().clear()
+        self.view.sel().add(R(101))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertEquals(find_pairs(self.view, "'"), [])
+
+        self.assertTrue(status_message.called)
+
+    def testFindsBracketsInWindows(self):
+        text = "(" + "a" * (3 * LONG_LINE_WINDOW) + ")"
+        self.view.run_command("append", { "characters": text })
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+
+        self.assertEquals(find_pairs(self.view, "("),
+                          [(0, 1, len(text) - 1, len(text))])
+
+    def testStopsBracketSearchAtSearchCap(self):
+        self.view.run_command("append", { "characters": "(" + "a" * 100 + ")" })
+        self.view.settings().set("six_surround_large_file_search_cap", 50)
+        self.view.sel().clear()
+        self.view.sel().add(R(51))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertEquals(find_pairs(self.view, "("), [])
+
+        self.assertTrue(status_message.called)
+
+    def testStopsBracketSearchAtTimeBudget(self):
+        self.view.run_command("append", {
+            "characters": "(" + "a" * (2 * LONG_LINE_WINDOW) + ")" })
+        self.view.settings().set("six_surround_large_file_time_budget", -1)
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertEquals(find_pairs(self.view, "("), [])
+
+        self.assertTrue(status_message.called)
+
+    def testSaysNothingWhenPairIsMissing(self):
+        self.view.run_command("append", { "characters": "aaa\nbbb" })
+        self.view.sel().clear()
+        self.view.sel().add(R(1))
+
+        with mock.patch("sublime.status_message") as status_message:
+            self.assertEquals(find_pairs(self.view, "("), [])
+            self.assertEquals(find_pairs(self.view, "'"), [])
+
+        self.assertFalse(status_message.called)
+
+    def testReadsTagsAroundCaretsOnly(self):
+        self.view.settings().set("six_surround_search_bound", 100)
+        filler = "<p>x</p>" * 1000
+        self.view.run_command("append", {
+            "characters": filler + "<b>y</b>" + filler + "<i>z</i>" })
+        self.view.sel().clear()
+        self.view.sel().add(R(len(filler) + 4))
+        self.view.sel().add(R(self.view.size() - 4))
+        read = self.countCharactersRead()
+
+        a, b = len(filler), self.view.size() - 8
+        self.assertEquals(find_pairs(self.view, "t"),
+                          [(a, a + 3, a + 4, a + 8), (b, b + 3, b + 4, b + 8)])
+        self.assertTrue(sum(read) <= 2 * 200)
+
+
+class Test_TextWindow(ViewTest):
+
+    def testCanReadLine(self):
+        self.view.run_command("append", { "characters": "aaa\nbxb\nccc" })
+
+        window = TextWindow.from_line(self.view, 5)
+
+        self.assertEquals(window.begin, 4)
+        self.assertEquals(window.end, 7)
+        self.assertEquals(window.text, "bxb")
+
+    def testCanReadBoundedLine(self):
+        self.view.run_command("append", { "characters": "aaa\nbbxbb\nccc" })
+
+        window = TextWindow.from_line(self.view, 6, radius=1)
+
+        self.assertEquals(window.begin, 5)
+        self.assertEquals(window.text, "bx")
+
+    def testCanFind(self):
+        self.view.run_command("append", { "characters": "aaa\nxbx\nccc" })
+
+        window = TextWindow.from_line(self.view, 5)
+
+        self.assertEquals(window.find("x", 5), 6)
+        self.assertEquals(window.find("x", 6), 6)
+        self.assertTrue(window.find("c", 5) < 0)
+
+    def testCanFindReversed(self):
+        self.view.run_command("append", { "characters": "aaa\nxbx\nccc" })
+
+        window = TextWindow.from_line(self.view, 5)
+
+        self.assertEquals(window.rfind("x", 5), 4)
+        self.assertEquals(window.rfind("x", 6), 6)
+        self.assertTrue(window.rfind("a", 5) < 0)
+
+
+class Test_build_index_async(ViewTest):
+
+    def setUp(self):
+        super().setUp()
+        # Run callbacks for the async thread when the test says so, and those
+        # for the main thread right away.
+        self.callbacks = []
+        patches = (
+            mock.patch("sublime.set_timeout_async",
+                       lambda callback, delay=0: self.callbacks.append(callback)),
+            mock.patch("sublime.set_timeout", lambda callback, delay=0: callback()),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def runAsyncCallbacks(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def testBuildsIndexInBackground(self):
+        self.view.run_command("append", { "characters": "(a)" })
+
+        build_index_async(self.view)
+
+        self.assertIsNone(get_index(self.view, build=False))
+        self.runAsyncCallbacks()
+        self.assertEquals(get_index(self.view, build=False).enclosing(1, "("), (0, 2))
+
+    def testDropsIndexIfBufferChangedMeanwhile(self):
+        self.view.run_command("append", { "characters": "(a)" })
+
+        build_index_async(self.view)
+        handovers = []
+        with mock.patch("sublime.set_timeout",
+                        lambda callback, delay=0: handovers.append(callback)):
+            self.runAsyncCallbacks()
+        self.view.run_command("append", { "characters": "(b)" })
+        handovers[0]()
+
+        self.assertIsNone(get_index(self.view, build=False))
+
+    def testBuildsIndexesInBackgroundOnly(self):
+        self.view.run_command("append", { "characters": "(a)" })
+
+        self.assertIsNone(get_index(self.view))
+        self.assertEquals(len(self.callbacks), 1)
+
+        self.runAsyncCallbacks()
+        self.assertIsNotNone(get_index(self.view))
+
+    def testBuildsStaleIndexesAgainInBackground(self):
+        self.view.run_command("append", { "characters": "(a)" })
+        get_index(self.view)
+        self.runAsyncCallbacks()
+        self.view.run_command("append", { "characters": "(b)" })
+
+        self.assertIsNone(get_index(self.view))
+        self.assertEquals(len(self.callbacks), 1)
+
+        self.runAsyncCallbacks()
+        self.assertEquals(get_index(self.view).enclosing(4, "("), (3, 5))
+
+    def testChangesAndDeletesWhileIndexIsBuilding(self):
+        self.view.run_command("append", { "characters": "f((a), b)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(7))
+
+        build_index_async(self.view)
+        self.assertIsNone(get_index(self.view))
+
+        self.view.run_command("_six_surround_change", { "old": "(", "new": "[" })
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "f[(a), b]")
+
+    def testListenerIndexesActivatedViews(self):
+        self.view.run_command("append", { "characters": "(a)" })
+
+        _six_surround_index_listener().on_activated(self.view)
+        self.runAsyncCallbacks()
+
+        self.assertIsNotNone(get_index(self.view, build=False))
+
+    def testListenerSkipsWidgets(self):
+        self.view.settings().set("is_widget", True)
+
+        _six_surround_index_listener().on_activated(self.view)
+
+        self.assertEquals(self.callbacks, [])
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from sublime import Region as R
+
+from Six.lib.command_state import CommandState
+from Six.lib.constants import Mode
+
+from User.six.surround import HIGHLIGHT_KEY
+from User.six.surround import clear_highlight
+from User.six.surround import highlight_pairs
+from User.six.surround import surround
+from User.six.surround import take_pairs
+from User.six.tests import ViewTest
+
+
+class Test_highlight_pairs(ViewTest):
+
+    def setUp(self):
+        super().setUp()
+        self.view.run_command("append", { "characters": "aaa (bbb) 'ccc'" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+        # Hold on to highlight updates until the test runs them.
+        self.callbacks = []
+        patch = mock.patch("sublime.set_timeout",
+                           lambda callback, delay=0: self.callbacks.append(callback))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(clear_highlight, self.view)
+
+    def runCallbacks(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def testHighlightsPairsAfterDelay(self):
+        highlight_pairs(self.view, "(")
+
+        self.assertEquals(self.view.get_regions(HIGHLIGHT_KEY), [])
+
+        self.runCallbacks()
+
+        self.assertEquals(self.view.get_regions(HIGHLIGHT_KEY), [R(4, 5), R(8, 9)])
+
+    def testCoalescesRequestsMadeDuringDelay(self):
+        with mock.patch("User.six.surround.find_pairs",
+                        return_value=[(11, 12, 15, 16)]) as find_pairs:
+            for old in ("(", "[", "'"):
+                highlight_pairs(self.view, old)
+            self.runCallbacks()
+
+        self.assertEquals(find_pairs.call_count, 1)
+        find_pairs.assert_called_once_with(self.view, "'", 1)
+        self.assertEquals(self.view.get_regions(HIGHLIGHT_KEY),
+                          [R(11, 12), R(15, 16)])
+
+    def testDoesNotRedrawSamePairs(self):
+        highlight_pairs(self.view, "(")
+        self.runCallbacks()
+
+        with mock.patch.object(self.view, "add_regions") as add_regions:
+            highlight_pairs(self.view, "(")
+            self.runCallbacks()
+
+        self.assertFalse(add_regions.called)
+
+    def testLeavesPairsForChange(self):
+        highlight_pairs(self.view, "(")
+        self.runCallbacks()
+
+        with mock.patch("User.six.surround.find_pairs") as find_pairs:
+            pairs = take_pairs(self.view, "(")
+
+        self.assertFalse(find_pairs.called)
+        self.assertEquals(pairs, [(4, 5, 8, 9)])
+
+    def testCanClear(self):
+        highlight_pairs(self.view, "(")
+        self.runCallbacks()
+        highlight_pairs(self.view, "'")
+        clear_highlight(self.view)
+        self.runCallbacks()
+
+        self.assertEquals(self.view.get_regions(HIGHLIGHT_KEY), [])
+
+    def testCanBeDisabled(self):
+        self.view.settings().set("six_surround_highlight_pairs", False)
+
+        highlight_pairs(self.view, "(")
+
+        self.assertEquals(self.callbacks, [])
+
+    def testHighlightsWhileChangeWaitsForNewDelimiter(self):
+        command = surround(register=False)["CSurround"]()
+        state = CommandState()
+        state.append("(")
+
+        with mock.patch.object(type(command), "view", new_callable=mock.PropertyMock,
+                               return_value=self.view):
+            command.process(Mode.Normal, state)
+            self.runCallbacks()
+
+            self.assertEquals(self.view.get_regions(HIGHLIGHT_KEY), [R(4, 5), R(8, 9)])
+
+            command.reset()
+
+        self.assertEquals(self.view.get_regions(HIGHLIGHT_KEY), [])
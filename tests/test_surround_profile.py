@@ -0,0 +1,36 @@
+from sublime import Region as R
+
+from User.six.surround import _recorder
+from User.six.surround import six_surround_profile
+from User.six.tests import ViewTest
+
+
+class Test_six_surround_profile(ViewTest):
+
+    def tearDown(self):
+        six_surround_profile().run("stop")
+        _recorder.reset()
+        super().tearDown()
+
+    def testRecordsPhasesWhileStarted(self):
+        self.view.run_command("append", { "characters": "aaa (bbb) ccc" })
+        self.view.sel().clear()
+        self.view.sel().add(R(5))
+
+        six_surround_profile().run("start")
+        self.view.run_command("_six_surround_change", { "old": "(", "new": "[" })
+        six_surround_profile().run("stop")
+        self.view.run_command("_six_surround_change", { "old": "[", "new": "{" })
+
+        self.assertEquals(len(_recorder.histograms["_six_surround_change.run"]), 1)
+        self.assertEquals(len(_recorder.histograms["find_pairs"]), 1)
+
+    def testCanDumpSummary(self):
+        six_surround_profile().run("start")
+        self.view.run_command("_six_surround_delete", { "old": "(" })
+
+        with self.assertLogs("Six.user.plugin.surround", level="INFO") as logs:
+            six_surround_profile().run("dump")
+
+        self.assertTrue(any("_six_surround_delete.run" in line
+                            for line in logs.output))
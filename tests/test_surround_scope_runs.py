@@ -0,0 +1,36 @@
+import unittest
+
+from User.six.surround import ScopeRuns
+from User.six.surround import TextWindow
+
+
+class ScopeNameView(object):
+    """A view that can only tell scopes a point at a time, like in Sublime Text 3.
+    """
+
+    def __init__(self, scopes):
+        self.scopes = scopes
+        self.asked = []
+
+    def change_count(self):
+        return 0
+
+    def scope_name(self, pt):
+        self.asked.append(pt)
+        return self.scopes[pt]
+
+
+class Test_ScopeRuns(unittest.TestCase):
+
+    def testAsksForScopesOfPointsOnlyOnce(self):
+        call = "source.python meta.function-call.python "
+        string = call + "string.quoted.double.python "
+        view = ScopeNameView([call, call, string, string, string, call])
+        runs = ScopeRuns(view)
+        window = TextWindow(0, 'f("(")')
+
+        self.assertTrue(runs.is_ignored(3, window))
+        self.assertFalse(runs.is_ignored(5, window))
+        self.assertTrue(runs.is_ignored(3, window))
+
+        self.assertEquals(view.asked, [3, 5])
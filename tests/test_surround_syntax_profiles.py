@@ -0,0 +1,92 @@
+from unittest import mock
+
+from sublime import Region as R
+
+from Six.lib.command_state import CommandState
+from Six.lib.constants import Mode
+
+from User.six.surround import BRACKETS
+from User.six.surround import get_brackets
+from User.six.surround import surround
+from User.six.tests import ViewTest
+
+
+class Test_get_brackets(ViewTest):
+
+    def testUsesBracketsWithoutProfile(self):
+        self.assertIs(get_brackets(self.view), BRACKETS)
+        self.assertIs(get_brackets(None), BRACKETS)
+
+    def testAddsProfileForSyntax(self):
+        self.view.assign_syntax("Packages/Python/Python.sublime-syntax")
+
+        brackets = get_brackets(self.view)
+
+        self.assertEquals(brackets["q"], ('"""', '"""'))
+        self.assertEquals(brackets["b"], ("(", ")"))
+
+    def testSharesProfileBetweenViewsWithSameSyntax(self):
+        self.view.assign_syntax("Packages/Python/Python.sublime-syntax")
+        other = self.window.new_file()
+        other.set_scratch(True)
+        other.assign_syntax("Packages/Python/Python.sublime-syntax")
+
+        self.assertIs(get_brackets(self.view), get_brackets(other))
+        self.assertIs(get_brackets(self.view).balanced, get_brackets(other).balanced)
+
+    def testBracketsAddedByUsersWin(self):
+        self.view.assign_syntax("Packages/Python/Python.sublime-syntax")
+        brackets = get_brackets(self.view)
+
+        surround(register=False, delimiters={"q": "`"})
+        self.addCleanup(BRACKETS.remove, "q")
+
+        self.assertIsNot(get_brackets(self.view), brackets)
+        self.assertEquals(get_brackets(self.view)["q"], ("`", "`"))
+
+
+class Test__six_surround_change_Profiles(ViewTest):
+
+    def testCanChangeProfileDelimiters(self):
+        self.view.assign_syntax("Packages/Python/Python.sublime-syntax")
+        self.view.run_command("append", { "characters": 'x = f"a{b}" + y' })
+        self.view.sel().clear()
+        self.view.sel().add(R(7))
+
+        self.view.run_command("_six_surround_change", { "old": "F", "new": "'" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), "x = 'a{b}' + y")
+
+    def testCanDeleteProfileDelimiters(self):
+        self.view.assign_syntax("Packages/LaTeX/LaTeX.sublime-syntax")
+        self.view.run_command("append", { "characters": "\\left( x \\right)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(7))
+
+        self.view.run_command("_six_surround_delete", { "old": "l" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())), " x ")
+
+    def testIgnoresProfilesForOtherSyntaxes(self):
+        self.view.run_command("append", { "characters": "\\left( x \\right)" })
+        self.view.sel().clear()
+        self.view.sel().add(R(7))
+
+        self.view.run_command("_six_surround_delete", { "old": "l" })
+
+        self.assertEquals(self.view.substr(R(0, self.view.size())),
+                          "\\left( x \\right)")
+
+    def testProcessAcceptsProfileKeys(self):
+        self.view.assign_syntax("Packages/Markdown/Markdown.sublime-syntax")
+        command = surround(register=False)["CSurround"]()
+        state = CommandState()
+        state.append("*")
+        state.append("_")
+
+        with mock.patch.object(type(command), "view", new_callable=mock.PropertyMock,
+                               return_value=self.view):
+            command.process(Mode.Normal, state)
+
+        self.assertEquals("*", command.old)
+        self.assertEquals("_", command.new)
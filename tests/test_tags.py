@@ -0,0 +1,80 @@
+import unittest
+
+from User.six.tags import TagScanner
+from User.six.tags import closing_tag
+
+TEXT = '<div class="a>b"><p>one <b>two</b> three</p><br><img src=x /></div>'
+
+
+def element(text, offset, count=1):
+    pair = TagScanner(text).enclosing(offset, count)
+    return pair and (text[pair[0]:pair[1]], text[pair[2]:pair[3]])
+
+
+class Test_closing_tag(unittest.TestCase):
+
+    def testCanCloseTag(self):
+        self.assertEquals(closing_tag("<div>"), "</div>")
+        self.assertEquals(closing_tag("<div class='x'>"), "</div>")
+
+    def testReturnsNoneForInvalidTag(self):
+        self.assertIsNone(closing_tag("<>"))
+        self.assertIsNone(closing_tag("<div"))
+        self.assertIsNone(closing_tag("div"))
+
+
+class Test_TagScanner(unittest.TestCase):
+
+    def testCanFindEnclosingElement(self):
+        self.assertEquals(element(TEXT, 30), ("<b>", "</b>"))
+        self.assertEquals(element(TEXT, 22), ("<p>", "</p>"))
+        self.assertEquals(element(TEXT, 50), ('<div class="a>b">', "</div>"))
+
+    def testCaretInsideTagBelongsToElement(self):
+        self.assertEquals(element(TEXT, 3), ('<div class="a>b">', "</div>"))
+        self.assertEquals(element(TEXT, 25), ("<b>", "</b>"))
+        self.assertEquals(element(TEXT, 33), ("<b>", "</b>"))
+
+    def testCanFindOuterElement(self):
+        self.assertEquals(element(TEXT, 30, count=2), ("<p>", "</p>"))
+        self.assertEquals(element(TEXT, 30, count=3), ('<div class="a>b">', "</div>"))
+        self.assertIsNone(element(TEXT, 30, count=4))
+
+    def testSkipsNestedElementsWithSameName(self):
+        text = "<b><b>x</b></b>"
+
+        self.assertEquals(TagScanner(text).enclosing(6), (3, 6, 7, 11))
+        self.assertEquals(TagScanner(text).enclosing(6, count=2), (0, 3, 11, 15))
+
+    def testSkipsUnclosedElements(self):
+        self.assertEquals(element("<a><p>x<p>y</a>", 10), ("<a>", "</a>"))
+
+    def testReturnsNoneIfNotFound(self):
+        self.assertIsNone(element("aaa <br> bbb", 2))
+
+    def testHonorsBounds(self):
+        self.assertIsNone(TagScanner(TEXT).enclosing(30, 3, hi=60))
+
+    def testIgnoresTagsInComments(self):
+        text = "<div>x<!-- </div> -->y</div>"
+
+        self.assertEquals(element(text, 5), ("<div>", "</div>"))
+        self.assertEquals(TagScanner(text).enclosing(5), (0, 5, 22, 28))
+
+    def testIgnoresTagsInCdataAndScripts(self):
+        text = "<p><![CDATA[</p>]]><script>'</p>'</script></p>"
+
+        self.assertEquals(TagScanner(text).enclosing(16), (0, 3, 42, 46))
+        self.assertEquals(element(text, 29), ("<script>", "</script>"))
+
+    def testLooksForCommentsOnlyUpToOffsetsAskedAbout(self):
+        text = "<div>x</div>" + "<!-- <a> -->" * 1000
+        scanner = TagScanner(text)
+
+        self.assertEquals(scanner.enclosing(5), (0, 5, 6, 12))
+        self.assertTrue(len(scanner._opaque[0]) <= 1)
+        self.assertIsNone(scanner.tag_at(len(text) - 7))
+
+    def testMatchesNamesIgnoringCase(self):
+        self.assertEquals(element("<DIV>x</div>", 5), ("<DIV>", "</div>"))
+        self.assertEquals(element("<B><b>x</B></b>", 6, count=2), ("<B>", "</b>"))
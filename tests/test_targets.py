@@ -0,0 +1,57 @@
+import unittest
+
+from User.six.targets import ENTER
+from User.six.targets import TargetTrie
+
+
+def read_tag(text):
+    return "<%s>" % text if text else None
+
+
+def feed(trie, keys):
+    reader = trie.reader()
+    return [reader.feed(key) for key in keys], reader.target
+
+
+class Test_TargetReader(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = TargetTrie({"<space>": " "})
+        self.trie.add("(", "(")
+        self.trie.add("q", "q")
+        self.trie.add("qq", "qq")
+        self.trie.add_reader("t", read_tag, (">", ENTER))
+
+    def testResolvesSingleKey(self):
+        self.assertEquals(feed(self.trie, "("), ([True], "("))
+
+    def testWaitsWhileLongerKeysStartWithKeysFed(self):
+        self.assertEquals(feed(self.trie, ["q"]), ([False], None))
+        self.assertEquals(feed(self.trie, "qq"), ([False, True], "qq"))
+
+    def testEnterPicksPrefix(self):
+        self.assertEquals(feed(self.trie, ["q", ENTER]), ([False, True], "q"))
+
+    def testReadsTextUpToEnd(self):
+        self.assertEquals(feed(self.trie, ["t", "p", "<space>", "x", ">"]),
+                          ([False, False, False, False, True], "<p x>"))
+
+    def testRaisesErrorIfNoTargetStartsWithKeys(self):
+        reader = self.trie.reader()
+        reader.feed("q")
+
+        self.assertRaises(ValueError, reader.feed, "x")
+        self.assertRaises(ValueError, self.trie.reader().feed, ENTER)
+
+    def testRaisesErrorIfTextIsInvalid(self):
+        reader = self.trie.reader()
+        reader.feed("t")
+
+        self.assertRaises(ValueError, reader.feed, ">")
+
+    def testCountsKeysFed(self):
+        reader = self.trie.reader()
+        for key in ("t", "b", ">"):
+            reader.feed(key)
+
+        self.assertEquals(reader.fed, 3)
@@ -0,0 +1,61 @@
+import unittest
+
+from User.six.timing import Histogram
+from User.six.timing import Recorder
+
+
+class Test_Histogram(unittest.TestCase):
+
+    def testCountsSamplesInBuckets(self):
+        histogram = Histogram()
+        for ms in (0.05, 0.3, 0.4, 2000):
+            histogram.add(ms)
+
+        self.assertEquals(len(histogram), 4)
+        self.assertEquals(histogram.counts[0], 1)
+        self.assertEquals(histogram.counts[2], 2)
+        self.assertEquals(histogram.counts[-1], 1)
+        self.assertEquals(histogram.slowest, 2000)
+
+    def testCanEstimatePercentiles(self):
+        histogram = Histogram()
+        for ms in (0.05, 0.3, 0.4, 2000):
+            histogram.add(ms)
+
+        self.assertEquals(histogram.percentile(50), 0.5)
+        self.assertEquals(histogram.percentile(100), 2000)
+
+
+class Test_Recorder(unittest.TestCase):
+
+    def testDoesNothingWhileDisabled(self):
+        recorder = Recorder()
+
+        @recorder.timed("phase")
+        def phase(x):
+            return x * 2
+
+        self.assertEquals(phase(2), 4)
+        recorder.count("characters read", 10)
+
+        self.assertEquals(recorder.histograms, {})
+        self.assertEquals(recorder.counters, {})
+
+    def testRecordsWhileEnabled(self):
+        recorder = Recorder()
+        recorder.enabled = True
+
+        @recorder.timed("phase")
+        def phase():
+            pass
+
+        phase()
+        phase()
+        recorder.count("characters read", 10)
+        recorder.count("scanner hits")
+        recorder.count("scanner misses", 3)
+
+        self.assertEquals(len(recorder.histograms["phase"]), 2)
+        self.assertEquals(recorder.counters["characters read"], 10)
+        self.assertEquals(recorder.hit_rate("scanner"), 0.25)
+        self.assertTrue(recorder.summary()[0].startswith("phase: 2 calls"))
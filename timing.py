@@ -0,0 +1,121 @@
+"""Opt-in latency instrumentation for the Surround plugin.
+
+Like `pairs`, nothing in here talks to Sublime Text. The view code wraps its
+phases with `Recorder.timed` and counts work with `Recorder.count`; both do next
+to nothing until the recorder is enabled.
+"""
+
+import functools
+
+from time import perf_counter
+
+# Upper bounds of the histogram buckets, in milliseconds. Slower samples go in an
+# extra bucket.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram(object):
+    """Latency samples for one phase, counted in `BUCKETS`.
+    """
+
+    __slots__ = ("counts", "total", "slowest")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        # Sum of all samples, in milliseconds.
+        self.total = 0.0
+        self.slowest = 0.0
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def add(self, ms):
+        i = 0
+        while i < len(BUCKETS) and ms > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += ms
+        self.slowest = max(self.slowest, ms)
+
+    def percentile(self, p):
+        """Return the upper bound of the bucket holding the `p`-th percentile.
+
+        Samples in the extra bucket are bounded by the slowest one.
+        """
+        wanted = p / 100 * len(self)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= wanted:
+                return BUCKETS[i] if i < len(BUCKETS) else self.slowest
+        return 0.0
+
+
+class Recorder(object):
+    """Per-phase latency histograms and work counters.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Maps phase names to their histograms.
+        self.histograms = {}
+        # Maps counter names to their counts.
+        self.counters = {}
+
+    def reset(self):
+        self.histograms = {}
+        self.counters = {}
+
+    def timed(self, phase):
+        """Decorate a function to record how long calls to it take as `phase`.
+        """
+        def decorate(function):
+            @functools.wraps(function)
+            def timed(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(phase, (perf_counter() - start) * 1000)
+            return timed
+        return decorate
+
+    def record(self, phase, ms):
+        try:
+            histogram = self.histograms[phase]
+        except KeyError:
+            histogram = self.histograms[phase] = Histogram()
+        histogram.add(ms)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def hit_rate(self, name):
+        """Return the ratio of "`name` hits" to lookups, counted with `count`.
+        """
+        hits = self.counters.get(name + " hits", 0)
+        total = hits + self.counters.get(name + " misses", 0)
+        return hits / total if total else 0.0
+
+    def summary(self):
+        """Return the recorded data as a list of human-readable lines.
+        """
+        lines = []
+        for phase in sorted(self.histograms):
+            histogram = self.histograms[phase]
+            lines.append(
+                "%s: %d calls, mean %.3f ms, p50 <= %.3f ms, p95 <= %.3f ms, "
+                "max %.3f ms" % (
+                    phase, len(histogram), histogram.total / len(histogram),
+                    histogram.percentile(50), histogram.percentile(95),
+                    histogram.slowest))
+            bounds = ["<=%g" % bound for bound in BUCKETS] + [">%g" % BUCKETS[-1]]
+            lines.append("  ms: " + ", ".join(
+                "%s: %d" % (bound, count)
+                for bound, count in zip(bounds, histogram.counts) if count))
+        for name in sorted(self.counters):
+            lines.append("%s: %d" % (name, self.counters[name]))
+        return lines